@@ -2,17 +2,12 @@ from numpy import *
 from numpy.random import *
 
 def resample(weights):
+    # Systematic resampling, one searchsorted instead of a running sum per index
     n = len(weights)
-    indices = []
-    C = [0.] + [sum(weights[:i+1]) for i in range(n)]
-    u0, j = random(), 0
+    C = cumsum(weights)
+    C[-1] = 1.
 
-    for u in [(u0+i)/n for i in range(n)]:
-        while u > C[j]:
-            j += 1
-        indices.append(j-1)
-
-    return indices
+    return searchsorted(C, (random() + arange(n)) / n)
 
 
 def particle_filter(sequence, pos, stepsize, n):
@@ -0,0 +1,241 @@
+# USAGE
+# python -m TrackingPrototype.multi_tracker --video match.mp4 --detections detections.h5
+# python -m TrackingPrototype.multi_tracker --video match.mp4 --detections detections.h5 --budget 20
+
+# import the necessary packages
+from concurrent.futures import ThreadPoolExecutor
+from imutils.video import FPS
+import argparse
+import time
+import cv2
+import numpy as np
+
+# trackers from the most to the least accurate, with a rough cost of one
+# update in milliseconds on a 1280x720 frame. These are only order of
+# magnitude defaults for when nothing could be measured, MultiTracker
+# times each type on its first keyframe with measure_tracker_costs
+TRACKER_COSTS = [
+    ("csrt", 15.),
+    ("kcf", 3.),
+    ("mosse", 0.3),
+]
+
+TRACKER_NAMES = {
+    "csrt": "CSRT",
+    "kcf": "KCF",
+    "boosting": "Boosting",
+    "mil": "MIL",
+    "tld": "TLD",
+    "medianflow": "MedianFlow",
+    "mosse": "MOSSE",
+}
+
+
+def create_tracker(tracker_type):
+    # OpenCV 4.5.1 and newer moved the contrib trackers into cv2.legacy,
+    # so look in both places for the constructor
+    name = "Tracker%s_create" % TRACKER_NAMES[tracker_type]
+    for module in (cv2, getattr(cv2, "legacy", None)):
+        if hasattr(module, name):
+            return getattr(module, name)()
+
+    raise ValueError("OpenCV build has no %s tracker" % tracker_type)
+
+
+def measure_tracker_costs(frame, box, n_updates=5):
+    """
+    Time one update of each tracker type in TRACKER_COSTS on this machine, types missing from
+    the OpenCV build are left out.
+    :param box: Object to track as x1, y1, x2, y2
+    :return: (tracker type, median update time in milliseconds) pairs, most accurate first
+    """
+    x1, y1, x2, y2 = (int(v) for v in box)
+    costs = []
+
+    for tracker_type, _ in TRACKER_COSTS:
+        try:
+            tracker = create_tracker(tracker_type)
+        except ValueError:
+            continue
+
+        tracker.init(frame, (x1, y1, x2 - x1, y2 - y1))
+        times = []
+        for _ in range(n_updates):
+            start = time.perf_counter()
+            tracker.update(frame)
+            times.append(time.perf_counter() - start)
+        costs.append((tracker_type, 1000 * float(np.median(times))))
+
+    return costs or TRACKER_COSTS
+
+
+def pick_tracker(budget_ms, n_objects, workers, costs=TRACKER_COSTS):
+    """
+    Most accurate tracker type that updates every object within the frame budget.
+    :param budget_ms: Time allowed for one frame of updates, in milliseconds
+    :param costs: (tracker type, update time in milliseconds) pairs, most accurate first
+    """
+    rounds = -(-n_objects // workers)
+    for tracker_type, cost in costs:
+        if rounds * cost <= budget_ms:
+            return tracker_type
+    return costs[-1][0]
+
+
+class MultiTracker:
+    """
+    One lightweight OpenCV tracker per detected player, all updated in parallel on a thread pool
+    (the trackers release the GIL while they run). Trackers are re-seeded from the detections on
+    every keyframe, in between they carry the boxes on their own.
+    :param tracker_type: Fixed tracker type, or None to pick one per keyframe from budget_ms
+    :param budget_ms: Time allowed for the updates of one frame, in milliseconds
+    """
+
+    def __init__(self, tracker_type=None, budget_ms=33., workers=4):
+        self.tracker_type = tracker_type
+        self.budget_ms = budget_ms
+        self.workers = workers
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+
+        # Update time of each tracker type, measured on the first keyframe with objects
+        self.costs = None
+        self.current_type = None
+        self.trackers = []
+        self.boxes = np.empty((0, 4))
+        self.success = np.empty(0, dtype=bool)
+
+        # Per tracker update counts and busy time, and the overall frame rate
+        self.updates = np.empty(0, dtype=int)
+        self.busy = np.empty(0)
+        self.fps = None
+
+    def __len__(self):
+        return len(self.trackers)
+
+    def _init(self, args):
+        tracker, frame, box = args
+        tracker.init(frame, box)
+        return tracker
+
+    def seed(self, frame, boxes):
+        """
+        Replace the trackers with one per detection.
+        :param boxes: (N, 4) detections of the frame as x1, y1, x2, y2
+        """
+        boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+        if self.tracker_type is None and self.costs is None and len(boxes):
+            self.costs = measure_tracker_costs(frame, boxes[0])
+        self.current_type = self.tracker_type or pick_tracker(self.budget_ms, len(boxes), self.workers, self.costs or TRACKER_COSTS)
+
+        # OpenCV trackers take x, y, w, h
+        rects = [tuple(int(v) for v in (x1, y1, x2 - x1, y2 - y1)) for x1, y1, x2, y2 in boxes]
+        trackers = [create_tracker(self.current_type) for _ in rects]
+        self.trackers = list(self.pool.map(self._init, [(t, frame, r) for t, r in zip(trackers, rects)]))
+
+        self.boxes = boxes
+        self.success = np.ones(len(boxes), dtype=bool)
+        self.updates = np.zeros(len(boxes), dtype=int)
+        self.busy = np.zeros(len(boxes))
+
+        if self.fps is None:
+            self.fps = FPS().start()
+
+    def _update(self, args):
+        i, frame = args
+        start = time.perf_counter()
+        success, (x, y, w, h) = self.trackers[i].update(frame)
+        return i, success, (x, y, x + w, y + h), time.perf_counter() - start
+
+    def update(self, frame):
+        """
+        :return: (N, 4) boxes of every tracker as x1, y1, x2, y2 and whether each was found,
+        boxes that were lost keep their last position
+        """
+        for i, success, box, elapsed in self.pool.map(self._update, [(i, frame) for i in range(len(self.trackers))]):
+            self.success[i] = success
+            if success:
+                self.boxes[i] = box
+            self.updates[i] += 1
+            self.busy[i] += elapsed
+
+        if self.fps is not None:
+            self.fps.update()
+        return self.boxes.copy(), self.success.copy()
+
+    def report(self):
+        """
+        :return: Frames per second of the whole manager and the mean and slowest per tracker
+        frames per second, over the trackers of the last keyframe
+        """
+        if self.fps is None:
+            return 0., 0., 0.
+
+        self.fps.stop()
+        tracker_fps = self.updates[self.busy > 0] / self.busy[self.busy > 0]
+        mean_fps = tracker_fps.mean() if len(tracker_fps) else 0.
+        slowest_fps = tracker_fps.min() if len(tracker_fps) else 0.
+
+        print("[INFO] tracker: {}, objects: {}, workers: {}".format(self.current_type, len(self), self.workers))
+        if self.costs is not None:
+            print("[INFO] measured update cost: {}".format(", ".join("{} {:.2f} ms".format(*c) for c in self.costs)))
+        print("[INFO] elapsed time: {:.2f}".format(self.fps.elapsed()))
+        print("[INFO] approx. FPS: {:.2f}".format(self.fps.fps()))
+        print("[INFO] per tracker FPS: {:.2f} mean, {:.2f} slowest".format(mean_fps, slowest_fps))
+        return self.fps.fps(), mean_fps, slowest_fps
+
+    def close(self):
+        self.pool.shutdown()
+
+
+if __name__ == "__main__":
+    from code.detection_store import DetectionStore
+
+    # construct the argument parser and parse the arguments
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-v", "--video", type=str, required=True,
+                    help="path to input video file")
+    ap.add_argument("-d", "--detections", type=str, required=True,
+                    help="HDF5 detections written by the YOLO stage")
+    ap.add_argument("-t", "--tracker", type=str, default=None,
+                    help="OpenCV object tracker type, picked from the budget if not given")
+    ap.add_argument("-b", "--budget", type=float, default=33.,
+                    help="milliseconds allowed for the tracker updates of one frame")
+    ap.add_argument("-k", "--keyframe", type=int, default=10,
+                    help="re-seed the trackers from the detections every k frames")
+    ap.add_argument("-w", "--workers", type=int, default=4,
+                    help="number of tracker threads")
+    args = vars(ap.parse_args())
+
+    vs = cv2.VideoCapture(args["video"])
+    detections = DetectionStore(args["detections"])
+    trackers = MultiTracker(args["tracker"], args["budget"], args["workers"])
+    frame_no = 0
+
+    # loop over frames from the video stream
+    while True:
+        ok, frame = vs.read()
+        if not ok:
+            break
+
+        # seed from the detections on keyframes, track in between
+        if frame_no % args["keyframe"] == 0:
+            trackers.seed(frame, detections[frame_no])
+            boxes, success = trackers.boxes, trackers.success
+        else:
+            boxes, success = trackers.update(frame)
+        frame_no += 1
+
+        for (x1, y1, x2, y2), found in zip(boxes.astype(int), success):
+            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0) if found else (0, 0, 255), 2)
+
+        # show the output frame
+        cv2.imshow("Frame", frame)
+        if cv2.waitKey(1) & 0xFF == ord("q"):
+            break
+
+    trackers.report()
+    trackers.close()
+
+    # release the file pointer and close all windows
+    vs.release()
+    cv2.destroyAllWindows()
@@ -1,15 +1,61 @@
+import queue
+import threading
+import time
+
 import numpy as np
 import cv2
 
 cap = cv2.VideoCapture('wales_vs_ireland.mp4')
 
-while cap.isOpened():
-    ret, frame = cap.read()
+# Decode in its own thread so reading the next frame overlaps displaying this one
+frames = queue.Queue(maxsize=32)
+stop = threading.Event()
+
+
+def put(item):
+    # A full queue would otherwise block the reader forever once the display loop has quit
+    while not stop.is_set():
+        try:
+            frames.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def read_frames():
+    while cap.isOpened() and not stop.is_set():
+        ret, frame = cap.read()
+        if not ret or not put(frame):
+            break
+    put(None)
+
+
+reader = threading.Thread(target=read_frames, daemon=True)
+reader.start()
+
+stall, depth, count = 0., 0, 0
+
+while True:
+    depth += frames.qsize()
+    start = time.perf_counter()
+    frame = frames.get()
+    stall += time.perf_counter() - start
+
+    if frame is None:
+        break
+    count += 1
+
     gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
 
     cv2.imshow('frame', gray)
     if cv2.waitKey(1) & 0xFF == ord('q'):
         break
 
+print('frames: {}, waiting on decode: {:.2f}s, mean queue depth: {:.2f}'.format(count, stall, depth / max(count, 1)))
+
+# The reader may still be inside cap.read(), release only once it has finished
+stop.set()
+reader.join()
 cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+cv2.destroyAllWindows()
@@ -0,0 +1,217 @@
+import numpy as np
+
+NB_BOX = 3
+
+_grid_cache = {}
+
+
+# One row per detection: coordinates, objectness and only the best class with its score
+BOX_DTYPE = np.dtype([('xmin', 'f4'), ('ymin', 'f4'), ('xmax', 'f4'), ('ymax', 'f4'),
+                      ('objness', 'f4'), ('label', 'i2'), ('score', 'f4')])
+
+
+class BoundBox:
+    """
+    Object view of a single detection row, for code that still expects the old box objects.
+    """
+    __slots__ = ('xmin', 'ymin', 'xmax', 'ymax', 'objness', 'label', 'score')
+
+    def __init__(self, xmin, ymin, xmax, ymax, objness=None, label=-1, score=-1):
+        self.xmin = xmin
+        self.ymin = ymin
+        self.xmax = xmax
+        self.ymax = ymax
+        self.objness = objness
+        self.label = label
+        self.score = score
+
+    def get_label(self):
+        return self.label
+
+    def get_score(self):
+        return self.score
+
+
+def as_bound_boxes(boxes):
+    return [BoundBox(*row) for row in boxes.tolist()]
+
+
+def _sigmoid(x):
+    return 1. / (1. + np.exp(-x))
+
+
+def _grid_table(shapes, anchors, net_h, net_w):
+    """
+    Column, row, grid size and anchor size for every candidate of every scale, in the order
+    the flattened network outputs are laid out. Only depends on the grid shapes so it is cached.
+    """
+    key = (tuple(shapes), tuple(tuple(a) for a in anchors), net_h, net_w)
+
+    if key not in _grid_cache:
+        cols, rows, grid_ws, grid_hs, anchor_ws, anchor_hs = [], [], [], [], [], []
+
+        for (grid_h, grid_w), scale_anchors in zip(shapes, anchors):
+            size = grid_h * grid_w * NB_BOX
+            scale_anchors = np.asarray(scale_anchors, dtype=np.float32).reshape(NB_BOX, 2)
+
+            rows.append(np.repeat(np.arange(grid_h), grid_w * NB_BOX))
+            cols.append(np.tile(np.repeat(np.arange(grid_w), NB_BOX), grid_h))
+            grid_ws.append(np.full(size, grid_w))
+            grid_hs.append(np.full(size, grid_h))
+            anchor_ws.append(np.tile(scale_anchors[:, 0] / net_w, grid_h * grid_w))
+            anchor_hs.append(np.tile(scale_anchors[:, 1] / net_h, grid_h * grid_w))
+
+        _grid_cache[key] = tuple(np.concatenate(c).astype(np.float32)
+                                 for c in (cols, rows, grid_ws, grid_hs, anchor_ws, anchor_hs))
+
+    return _grid_cache[key]
+
+
+def decode_netout(netouts, anchors, obj_thresh, net_h, net_w, class_filter=None):
+    """
+    Decode the raw outputs of all three YOLO scales in one pass.
+    :param netouts: The outputs for a single image, one (grid_h, grid_w, 3 * (5 + classes)) array per scale
+    :param anchors: The anchors of each scale, in the same order as netouts
+    :param obj_thresh: Objectness (and class probability) threshold
+    :param net_h: Network input height
+    :param net_w: Network input width
+    :param class_filter: Indices of the classes to consider, all classes if None
+    :return: A BOX_DTYPE array of boxes, coordinates in units of the network input
+    """
+    shapes = [netout.shape[:2] for netout in netouts]
+    flat = np.concatenate([netout.reshape(-1, netout.shape[-1] // NB_BOX) for netout in netouts])
+
+    # Objectness first so everything else is only computed for the survivors
+    objectness = _sigmoid(flat[:, 4])
+    keep = objectness > obj_thresh
+
+    cols, rows, grid_ws, grid_hs, anchor_ws, anchor_hs = (c[keep] for c in _grid_table(shapes, anchors, net_h, net_w))
+    flat = flat[keep]
+    objectness = objectness[keep]
+
+    x = (cols + _sigmoid(flat[:, 0])) / grid_ws
+    y = (rows + _sigmoid(flat[:, 1])) / grid_hs
+    w = anchor_ws * np.exp(flat[:, 2])
+    h = anchor_hs * np.exp(flat[:, 3])
+
+    classes = np.arange(flat.shape[1] - 5) if class_filter is None else np.asarray(class_filter)
+    class_logits = flat[:, 5 + classes]
+    best = np.argmax(class_logits, axis=1)
+
+    # The sigmoid is monotonic so only the best logit needs converting
+    score = objectness * _sigmoid(class_logits[np.arange(len(flat)), best])
+    score *= score > obj_thresh
+
+    boxes = np.empty(len(flat), dtype=BOX_DTYPE)
+    boxes['xmin'] = x - w / 2
+    boxes['ymin'] = y - h / 2
+    boxes['xmax'] = x + w / 2
+    boxes['ymax'] = y + h / 2
+    boxes['objness'] = objectness
+    boxes['label'] = classes[best]
+    boxes['score'] = score
+
+    return boxes
+
+
+def correct_yolo_boxes(boxes, image_h, image_w, net_h, net_w, letterbox=False):
+    """
+    Scale boxes from network input units to image pixels in place.
+    :param letterbox: Whether the image was letterboxed (aspect kept, padded) rather than stretched
+    """
+    new_w, new_h = net_w, net_h
+
+    if letterbox:
+        if (float(net_w)/image_w) < (float(net_h)/image_h):
+            new_h = (image_h*net_w)/image_w
+        else:
+            new_w = (image_w*net_h)/image_h
+
+    x_offset, x_scale = (net_w - new_w)/2./net_w, float(new_w)/net_w
+    y_offset, y_scale = (net_h - new_h)/2./net_h, float(new_h)/net_h
+
+    boxes['xmin'] = np.trunc((boxes['xmin'] - x_offset) / x_scale * image_w)
+    boxes['xmax'] = np.trunc((boxes['xmax'] - x_offset) / x_scale * image_w)
+    boxes['ymin'] = np.trunc((boxes['ymin'] - y_offset) / y_scale * image_h)
+    boxes['ymax'] = np.trunc((boxes['ymax'] - y_offset) / y_scale * image_h)
+
+
+def box_coords(boxes):
+    return np.stack((boxes['xmin'], boxes['ymin'], boxes['xmax'], boxes['ymax']), axis=1)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise intersection over union.
+    :param boxes_a: (N, 4) array of xmin, ymin, xmax, ymax
+    :param boxes_b: (M, 4) array of xmin, ymin, xmax, ymax
+    :return: (N, M) array of IoUs
+    """
+    top_left = np.maximum(boxes_a[:, np.newaxis, :2], boxes_b[np.newaxis, :, :2])
+    bottom_right = np.minimum(boxes_a[:, np.newaxis, 2:], boxes_b[np.newaxis, :, 2:])
+    intersect = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    union = area_a[:, np.newaxis] + area_b[np.newaxis, :] - intersect
+
+    return intersect / np.maximum(union, np.finfo(np.float32).tiny)
+
+
+def nms_indices(coords, scores, nms_thresh):
+    """
+    Greedy non-maximum suppression for a single class.
+    :param coords: (N, 4) array of box coordinates
+    :param scores: (N,) array of scores, boxes scoring 0 are ignored
+    :param nms_thresh: IoU at or above which the lower scoring box is suppressed
+    :return: Indices of the kept boxes, highest score first
+    """
+    order = np.argsort(-scores, kind='stable')
+    order = order[scores[order] > 0]
+    ious = iou_matrix(coords[order], coords[order])
+
+    suppressed = np.zeros(len(order), dtype=bool)
+    for i in range(len(order)):
+        if suppressed[i]: continue
+        suppressed[i+1:] |= ious[i, i+1:] >= nms_thresh
+
+    return order[~suppressed]
+
+
+def batched_nms(coords, scores, classes, nms_thresh):
+    """
+    Per-class non-maximum suppression in a single pass. Boxes are shifted apart by class so boxes
+    of different classes can never overlap, then suppressed together.
+    :param classes: (N,) array with the class of each box
+    :return: Indices of the kept boxes, highest score first
+    """
+    if len(coords) == 0:
+        return np.empty(0, dtype=int)
+
+    coords = coords.astype(np.float64)
+    offsets = classes * (coords.max() - coords.min() + 1)
+    return nms_indices(coords + offsets[:, np.newaxis], scores, nms_thresh)
+
+
+def do_nms(boxes, nms_thresh, class_filter=None, agnostic=False):
+    """
+    Non-maximum suppression over a decoded box array, in place: suppressed boxes have their score zeroed.
+    :param class_filter: Indices of the classes to keep, boxes of any other class are zeroed without being considered
+    :param agnostic: Suppress across classes rather than per class
+    """
+    if len(boxes) == 0:
+        return
+
+    scores = boxes['score']
+    if class_filter is not None:
+        scores[~np.isin(boxes['label'], list(class_filter))] = 0
+
+    coords = box_coords(boxes)
+    kept = np.zeros(len(boxes), dtype=bool)
+
+    if agnostic:
+        kept[nms_indices(coords, scores, nms_thresh)] = True
+    else:
+        kept[batched_nms(coords, scores, boxes['label'], nms_thresh)] = True
+
+    scores[~kept] = 0
@@ -0,0 +1,125 @@
+import h5py
+import numpy as np
+
+from boxes import box_coords
+
+# Rows of every frame are buffered and flushed together to avoid many tiny HDF5 writes
+FLUSH_EVERY = 256
+
+
+class DetectionWriter:
+    """
+    Writes per-frame player detections to the HDF5 store read by code.detection_store.DetectionStore.
+
+    Layout:
+        boxes   (rows, 4) float32  xmin, ymin, xmax, ymax in footage pixels, frames concatenated in order
+        scores  (rows,)   float32  detection score of each row
+        offsets (frames + 1,) int64  frame i owns rows offsets[i]:offsets[i + 1]
+        keyframes (frames,) bool     whether the detector ran on the frame, otherwise its rows were carried from the last keyframe
+        attrs   video, frame_count, start_frame (video frame of the store's first frame)
+    """
+
+    def __init__(self, filename, video, chunk_rows=4096, start_frame=0):
+        self.file = h5py.File(filename, 'w')
+        self.file.attrs['video'] = video
+        self.file.attrs['frame_count'] = 0
+        self.file.attrs['start_frame'] = start_frame
+
+        self.boxes = self.file.create_dataset('boxes', (0, 4), np.float32, maxshape=(None, 4), chunks=(chunk_rows, 4))
+        self.scores = self.file.create_dataset('scores', (0,), np.float32, maxshape=(None,), chunks=(chunk_rows,))
+        self.offsets = self.file.create_dataset('offsets', (1,), np.int64, maxshape=(None,), chunks=(chunk_rows,))
+        self.keyframes = self.file.create_dataset('keyframes', (0,), bool, maxshape=(None,), chunks=(chunk_rows,))
+
+        self.rows = 0
+        self.pending = []
+        self.pending_keyframes = []
+
+    def append(self, v_boxes, keyframe=True):
+        """
+        Add the detections of the next frame.
+        :param v_boxes: The frame's detections as returned by get_boxes
+        :param keyframe: False if the boxes were carried from an earlier frame rather than detected
+        """
+        self.pending.append(v_boxes)
+        self.pending_keyframes.append(keyframe)
+        if len(self.pending) >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+
+        counts = np.array([len(v_boxes) for v_boxes in self.pending], np.int64)
+        coords = np.concatenate([box_coords(v_boxes) for v_boxes in self.pending]).astype(np.float32)
+        scores = np.concatenate([v_boxes['score'] for v_boxes in self.pending]).astype(np.float32)
+
+        start, frames = self.rows, len(self.offsets) - 1
+        self.rows += len(coords)
+
+        self.boxes.resize((self.rows, 4))
+        self.boxes[start:] = coords
+        self.scores.resize((self.rows,))
+        self.scores[start:] = scores
+
+        self.offsets.resize((frames + len(counts) + 1,))
+        self.offsets[frames + 1:] = start + np.cumsum(counts)
+        self.keyframes.resize((frames + len(counts),))
+        self.keyframes[frames:] = self.pending_keyframes
+        self.file.attrs['frame_count'] = frames + len(counts)
+
+        self.pending = []
+        self.pending_keyframes = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def merge_stores(filenames, output, video, n_frames):
+    """
+    Join stores written over parts of the same video, e.g. one per scene segment, into one store
+    covering frames [0, n_frames). Each part is placed at its start_frame, frames no part covers
+    are stored empty and marked as not detected.
+    """
+    parts = sorted((h5py.File(filename, 'r') for filename in filenames), key=lambda f: int(f.attrs.get('start_frame', 0)))
+
+    with h5py.File(output, 'w') as out:
+        out.attrs['video'] = video
+        out.attrs['frame_count'] = n_frames
+        out.attrs['start_frame'] = 0
+
+        boxes = out.create_dataset('boxes', (0, 4), np.float32, maxshape=(None, 4), chunks=True)
+        scores = out.create_dataset('scores', (0,), np.float32, maxshape=(None,), chunks=True)
+        counts = np.zeros(n_frames, np.int64)
+        keyframes = np.zeros(n_frames, bool)
+        rows = 0
+
+        for part in parts:
+            start = int(part.attrs.get('start_frame', 0))
+            offsets = part['offsets'][:]
+            frames = min(len(offsets) - 1, n_frames - start)
+            if frames <= 0:
+                continue
+
+            # Parts are in frame order and do not overlap, so their rows go on the end
+            end_row = offsets[frames]
+            boxes.resize((rows + end_row, 4))
+            boxes[rows:] = part['boxes'][:end_row]
+            scores.resize((rows + end_row,))
+            scores[rows:] = part['scores'][:end_row]
+            rows += end_row
+
+            counts[start:start + frames] = np.diff(offsets[:frames + 1])
+            keyframes[start:start + frames] = part['keyframes'][:frames] if 'keyframes' in part else True
+
+        out['offsets'] = np.concatenate(([0], np.cumsum(counts)))
+        out['keyframes'] = keyframes
+
+    for part in parts:
+        part.close()
@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+
+
+class KeyframeScheduler:
+    """
+    Decides which frames the detector runs on and carries the detections of the last keyframe
+    through the frames in between. Features inside each detected box are followed with sparse
+    Lucas-Kanade flow and the box moves with the mean displacement of its features. The detector
+    runs again after interval frames, on a scene change, or as soon as too many boxes have lost
+    their features and the carried positions can no longer be trusted.
+    :param interval: Most frames between two keyframes
+    :param max_lost: Share of boxes that may lose their features before detection is forced
+    :param cut_thresh: Thumbnail histogram distance treated as a scene change
+    :param propagate: Follow the boxes with flow, otherwise frames between keyframes get no boxes
+    :param scale: Resolution the flow is computed at
+    """
+
+    def __init__(self, interval=4, max_lost=0.3, cut_thresh=0.3, propagate=True, scale=0.5):
+        self.interval = interval
+        self.max_lost = max_lost
+        self.cut_thresh = cut_thresh
+        self.propagate = propagate
+        self.scale = scale
+
+        self.grey = None
+        self.hist = None
+        self.boxes = None
+        self.points = None
+        self.owners = None
+        self.since = 0
+
+        self.keyframes = 0
+        self.frames = 0
+
+    def _histogram(self, grey):
+        thumb = cv2.resize(grey, (64, 36), interpolation=cv2.INTER_AREA)
+        return np.bincount(thumb.ravel() >> 3, minlength=32) / thumb.size
+
+    def _track(self, grey):
+        """
+        Move the boxes onto this frame.
+        :return: Share of the boxes that lost all their features
+        """
+        if self.points is None or len(self.points) == 0:
+            return 1. if len(self.boxes) else 0.
+
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self.grey, grey, self.points, None)
+        tracked = status.ravel() == 1
+
+        owners = self.owners[tracked]
+        shift = (points[tracked] - self.points[tracked]).reshape(-1, 2) / self.scale
+        counts = np.bincount(owners, minlength=len(self.boxes))
+        moving = counts > 0
+
+        for axis, (low, high) in enumerate((('xmin', 'xmax'), ('ymin', 'ymax'))):
+            mean = np.bincount(owners, shift[:, axis], minlength=len(self.boxes))[moving] / counts[moving]
+            self.boxes[low][moving] += mean
+            self.boxes[high][moving] += mean
+
+        self.points, self.owners = points[tracked], owners
+        return np.count_nonzero(~moving) / len(self.boxes)
+
+    def update(self, frame):
+        """
+        Carry the boxes of the last keyframe onto frame.
+        :return: True if the detector should run on this frame
+        """
+        self.frames += 1
+        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        grey = cv2.resize(grey, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        hist = self._histogram(grey)
+
+        if self.grey is None or self.since + 1 >= self.interval:
+            detect = True
+        elif 0.5 * np.abs(hist - self.hist).sum() > self.cut_thresh:
+            detect = True
+        elif self.propagate and len(self.boxes):
+            detect = self._track(grey) > self.max_lost
+        else:
+            detect = False
+
+        self.grey, self.hist = grey, hist
+        self.since += 1
+        return detect
+
+    def keyframe(self, v_boxes):
+        """
+        Start carrying the boxes the detector found on the frame passed to the last update.
+        """
+        self.keyframes += 1
+        self.since = 0
+        self.boxes = v_boxes.copy()
+        self.points = self.owners = None
+
+        if not self.propagate or len(v_boxes) == 0:
+            return
+
+        # Features only inside the boxes, each owned by the box it falls in
+        coords = np.stack([v_boxes[f] for f in ('xmin', 'ymin', 'xmax', 'ymax')], axis=1) * self.scale
+        coords = np.clip(np.round(coords), 0, [self.grey.shape[1], self.grey.shape[0]] * 2).astype(int)
+
+        mask = np.zeros_like(self.grey)
+        for x1, y1, x2, y2 in coords:
+            mask[y1:y2, x1:x2] = 255
+
+        points = cv2.goodFeaturesToTrack(self.grey, 20 * len(v_boxes), 0.01, 3, mask=mask)
+        if points is None:
+            return
+
+        x, y = points[:, 0, 0, np.newaxis], points[:, 0, 1, np.newaxis]
+        inside = (coords[:, 0] <= x) & (x < coords[:, 2]) & (coords[:, 1] <= y) & (y < coords[:, 3])
+        self.points = points
+        self.owners = np.argmax(inside, axis=1)
+
+    def carried(self):
+        """
+        :return: The boxes of the last keyframe moved onto the current frame, none without propagation
+        """
+        if not self.propagate or self.boxes is None:
+            return self.boxes[:0] if self.boxes is not None else None
+        return self.boxes.copy()
+
+    def report(self):
+        print("Detector ran on %d of %d frames (%.1f%%)" % (self.keyframes, self.frames, 100 * self.keyframes / max(self.frames, 1)))
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+
+# Marks the end of the stream as it passes from one stage to the next
+_DONE = object()
+
+
+class Stage(threading.Thread):
+    """
+    One step of a Pipeline, running func on every item taken from its input queue in its own thread.
+    A stage without an input queue is the source and func must return an iterable of items instead.
+    """
+
+    def __init__(self, name, func, inbox, outbox, stop):
+        threading.Thread.__init__(self, name=name, daemon=True)
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.stop = stop
+        self.error = None
+
+        self.items = 0
+        self.busy_time = 0.
+        self.input_stall = 0.
+        self.output_stall = 0.
+        self.depth_total = 0
+        self.depth_max = 0
+
+    def _get(self):
+        depth = self.inbox.qsize()
+        self.depth_total += depth
+        self.depth_max = max(self.depth_max, depth)
+
+        start = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                return self.inbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            finally:
+                self.input_stall += time.perf_counter() - start
+                start = time.perf_counter()
+        return _DONE
+
+    def _put(self, item):
+        start = time.perf_counter()
+        while not self.stop.is_set():
+            try:
+                self.outbox.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self.output_stall += time.perf_counter() - start
+
+    def _process(self):
+        if self.inbox is None:
+            items = iter(self.func())
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                item = next(items, _DONE)
+                self.busy_time += time.perf_counter() - start
+
+                if item is _DONE:
+                    break
+                self.items += 1
+                self._put(item)
+            return
+
+        while True:
+            item = self._get()
+            if item is _DONE:
+                break
+
+            start = time.perf_counter()
+            result = self.func(item)
+            self.busy_time += time.perf_counter() - start
+            self.items += 1
+
+            if self.outbox is not None:
+                self._put(result)
+
+    def run(self):
+        try:
+            self._process()
+        except Exception as e:
+            self.error = e
+            self.stop.set()
+        finally:
+            if self.outbox is not None:
+                self._put(_DONE)
+
+    def report(self):
+        mean_depth = self.depth_total / self.items if self.inbox is not None and self.items else 0
+        return ("%-10s items: %6d  busy: %7.2fs  input stall: %7.2fs  output stall: %7.2fs  queue depth: %5.2f avg / %d max"
+                % (self.name, self.items, self.busy_time, self.input_stall, self.output_stall, mean_depth, self.depth_max))
+
+
+class Pipeline:
+    """
+    Chain of stages joined by bounded queues so I/O overlaps compute, the total run time
+    approaching that of the slowest stage.
+    :param source: Callable returning an iterable of items, run in the first thread
+    :param stages: (name, func) pairs, each run in its own thread on the output of the previous stage
+    :param maxsize: Capacity of each queue between stages
+    """
+
+    def __init__(self, source, stages, maxsize=8):
+        self.stop = threading.Event()
+        self.stages = []
+
+        inbox = None
+        for i, (name, func) in enumerate([('reader', source)] + list(stages)):
+            outbox = queue.Queue(maxsize) if i < len(stages) else None
+            self.stages.append(Stage(name, func, inbox, outbox, self.stop))
+            inbox = outbox
+
+    def run(self):
+        start = time.perf_counter()
+
+        for stage in self.stages:
+            stage.start()
+        for stage in self.stages:
+            stage.join()
+
+        self.elapsed = time.perf_counter() - start
+
+        for stage in self.stages:
+            if stage.error is not None:
+                raise stage.error
+
+        return self.elapsed
+
+    def report(self):
+        for stage in self.stages:
+            print(stage.report())
+        print("total: %.2fs" % self.elapsed)
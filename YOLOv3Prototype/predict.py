@@ -7,110 +7,27 @@ from matplotlib import pyplot
 from matplotlib.patches import Rectangle
 import cv2
 import glob
-
-class BoundBox:
-    def __init__(self, xmin, ymin, xmax, ymax, objness = None, classes = None):
-        self.xmin = xmin
-        self.ymin = ymin
-        self.xmax = xmax
-        self.ymax = ymax
-        self.objness = objness
-        self.classes = classes
-        self.label = -1
-        self.score = -1
-
-    def get_label(self):
-        if self.label == -1:
-            self.label = np.argmax(self.classes)
-
-        return self.label
-
-    def get_score(self):
-        if self.score == -1:
-            self.score = self.classes[self.get_label()]
-
-        return self.score
-
-def _sigmoid(x):
-    return 1. / (1. + np.exp(-x))
-
-def decode_netout(netout, anchors, obj_thresh, net_h, net_w):
-    grid_h, grid_w = netout.shape[:2]
-    nb_box = 3
-    netout = netout.reshape((grid_h, grid_w, nb_box, -1))
-    nb_class = netout.shape[-1] - 5
-    boxes = []
-    netout[..., :2]  = _sigmoid(netout[..., :2])
-    netout[..., 4:]  = _sigmoid(netout[..., 4:])
-    netout[..., 5:]  = netout[..., 4][..., np.newaxis] * netout[..., 5:]
-    netout[..., 5:] *= netout[..., 5:] > obj_thresh
-
-    for i in range(grid_h*grid_w):
-        row = i / grid_w
-        col = i % grid_w
-        for b in range(nb_box):
-            # 4th element is objectness score
-            objectness = netout[int(row)][int(col)][b][4]
-            if(objectness.all() <= obj_thresh): continue
-            # first 4 elements are x, y, w, and h
-            x, y, w, h = netout[int(row)][int(col)][b][:4]
-            x = (col + x) / grid_w # center position, unit: image width
-            y = (row + y) / grid_h # center position, unit: image height
-            w = anchors[2 * b + 0] * np.exp(w) / net_w # unit: image width
-            h = anchors[2 * b + 1] * np.exp(h) / net_h # unit: image height
-            # last elements are class probabilities
-            classes = netout[int(row)][col][b][5:]
-            box = BoundBox(x-w/2, y-h/2, x+w/2, y+h/2, objectness, classes)
-            boxes.append(box)
-    return boxes
-
-def correct_yolo_boxes(boxes, image_h, image_w, net_h, net_w):
-    new_w, new_h = net_w, net_h
-    for i in range(len(boxes)):
-        x_offset, x_scale = (net_w - new_w)/2./net_w, float(new_w)/net_w
-        y_offset, y_scale = (net_h - new_h)/2./net_h, float(new_h)/net_h
-        boxes[i].xmin = int((boxes[i].xmin - x_offset) / x_scale * image_w)
-        boxes[i].xmax = int((boxes[i].xmax - x_offset) / x_scale * image_w)
-        boxes[i].ymin = int((boxes[i].ymin - y_offset) / y_scale * image_h)
-        boxes[i].ymax = int((boxes[i].ymax - y_offset) / y_scale * image_h)
-
-def _interval_overlap(interval_a, interval_b):
-    x1, x2 = interval_a
-    x3, x4 = interval_b
-    if x3 < x1:
-        if x4 < x1:
-            return 0
-        else:
-            return min(x2,x4) - x1
-    else:
-        if x2 < x3:
-            return 0
-        else:
-            return min(x2,x4) - x3
-
-def bbox_iou(box1, box2):
-    intersect_w = _interval_overlap([box1.xmin, box1.xmax], [box2.xmin, box2.xmax])
-    intersect_h = _interval_overlap([box1.ymin, box1.ymax], [box2.ymin, box2.ymax])
-    intersect = intersect_w * intersect_h
-    w1, h1 = box1.xmax-box1.xmin, box1.ymax-box1.ymin
-    w2, h2 = box2.xmax-box2.xmin, box2.ymax-box2.ymin
-    union = w1*h1 + w2*h2 - intersect
-    return float(intersect) / union
-
-def do_nms(boxes, nms_thresh):
-    if len(boxes) > 0:
-        nb_class = len(boxes[0].classes)
-    else:
-        return
-    for c in range(nb_class):
-        sorted_indices = np.argsort([-box.classes[c] for box in boxes])
-        for i in range(len(sorted_indices)):
-            index_i = sorted_indices[i]
-            if boxes[index_i].classes[c] == 0: continue
-            for j in range(i+1, len(sorted_indices)):
-                index_j = sorted_indices[j]
-                if bbox_iou(boxes[index_i], boxes[index_j]) >= nms_thresh:
-                    boxes[index_j].classes[c] = 0
+import time
+
+from boxes import decode_netout, correct_yolo_boxes, do_nms
+from pipeline import Pipeline
+from detection_store import DetectionWriter
+from keyframes import KeyframeScheduler
+
+INPUT_W, INPUT_H = 416, 416
+ANCHORS = [[116,90, 156,198, 373,326], [30,61, 62,45, 59,119], [10,13, 16,30, 33,23]]
+CLASS_THRESHOLD = 0.6
+
+LABELS = ["person", "bicycle", "car", "motorbike", "aeroplane", "bus", "train", "truck",
+          "boat", "traffic light", "fire hydrant", "stop sign", "parking meter", "bench",
+          "bird", "cat", "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe",
+          "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard",
+          "sports ball", "kite", "baseball bat", "baseball glove", "skateboard", "surfboard",
+          "tennis racket", "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana",
+          "apple", "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake",
+          "chair", "sofa", "pottedplant", "bed", "diningtable", "toilet", "tvmonitor", "laptop", "mouse",
+          "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink", "refrigerator",
+          "book", "clock", "vase", "scissors", "teddy bear", "hair drier", "toothbrush"]
 
 # load and prepare an image
 def load_image_pixels(filename, shape):
@@ -130,125 +47,370 @@ def load_image_pixels(filename, shape):
 
 # get all of the results above a threshold
 def get_boxes(boxes, labels, thresh):
-    v_boxes, v_labels, v_scores = list(), list(), list()
-    # enumerate all boxes
-    for box in boxes:
-        # enumerate all possible labels
-        for i in range(len(labels)):
-            # check if the threshold for this label is high enough
-            if box.classes[i] > thresh:
-                v_boxes.append(box)
-                v_labels.append(labels[i])
-                v_scores.append(box.classes[i]*100)
-            # don't break, many labels may trigger for one box
+    v_boxes = boxes[boxes['score'] > thresh]
+    v_labels = [labels[label] for label in v_boxes['label']]
+    v_scores = v_boxes['score'] * 100
     return v_boxes, v_labels, v_scores
 
-# draw all results
-def draw_boxes(filename, v_boxes, v_labels, v_scores):
-    # load the image
-    image = cv2.imread(filename)
-
+# draw all results onto a BGR image
+def annotate_image(image, v_boxes, v_labels, v_scores):
     # plot each box
     for i in range(len(v_boxes)):
         box = v_boxes[i]
         # get coordinates
-        y1, x1, y2, x2 = box.ymin, box.xmin, box.ymax, box.xmax
-        # calculate width and height of the box
-        width, height = x2 - x1, y2 - y1
+        y1, x1, y2, x2 = int(box['ymin']), int(box['xmin']), int(box['ymax']), int(box['xmax'])
 
         label = "%s (%.3f)" % (v_labels[i] + str(i), v_scores[i])
         # create the shape
         image = cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
         cv2.putText(image, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36,255,12), 2)
 
+    return image
+
+# draw all results
+def draw_boxes(filename, v_boxes, v_labels, v_scores):
+    # load the image
+    image = cv2.imread(filename)
+    image = annotate_image(image, v_boxes, v_labels, v_scores)
+
     # show the plot
     cv2.imshow('frame', image)
 
 
-def process_video(v_filename):
-    model = load_model('model.h5')
-    input_w, input_h = 416, 416
-    anchors = [[116,90, 156,198, 373,326], [30,61, 62,45, 59,119], [10,13, 16,30, 33,23]]
-    class_threshold = 0.6
-
-    labels = ["person", "bicycle", "car", "motorbike", "aeroplane", "bus", "train", "truck",
-              "boat", "traffic light", "fire hydrant", "stop sign", "parking meter", "bench",
-              "bird", "cat", "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra", "giraffe",
-              "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee", "skis", "snowboard",
-              "sports ball", "kite", "baseball bat", "baseball glove", "skateboard", "surfboard",
-              "tennis racket", "bottle", "wine glass", "cup", "fork", "knife", "spoon", "bowl", "banana",
-              "apple", "sandwich", "orange", "broccoli", "carrot", "hot dog", "pizza", "donut", "cake",
-              "chair", "sofa", "pottedplant", "bed", "diningtable", "toilet", "tvmonitor", "laptop", "mouse",
-              "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink", "refrigerator",
-              "book", "clock", "vase", "scissors", "teddy bear", "hair drier", "toothbrush"]
+# letterbox a decoded BGR frame into a network input, without touching the disk
+def preprocess_frame(frame, net_h, net_w, out=None):
+    image_h, image_w, _ = frame.shape
+    scale = min(float(net_w) / image_w, float(net_h) / image_h)
+    new_w, new_h = int(image_w * scale), int(image_h * scale)
 
-    cap = cv2.VideoCapture(v_filename)
-    frame_no = 0
+    # resize while still uint8, then convert BGR to RGB and scale to [0, 1]
+    resized = cv2.resize(frame, (new_w, new_h))[:, :, ::-1].astype('float32')
+    resized /= 255.0
 
-    while cap.isOpened():
-        ret, frame = cap.read()
+    # out lets a batch be filled slot by slot without an extra copy
+    if out is None:
+        image = np.empty((1, net_h, net_w, 3), dtype='float32')
+        out = image[0]
+    else:
+        image = out
+
+    out.fill(0.5)
+    top, left = (net_h - new_h) // 2, (net_w - new_w) // 2
+    out[top:top + new_h, left:left + new_w] = resized
+    return image
+
+
+def postprocess(netouts, image_h, image_w, letterbox=True):
+    boxes = decode_netout(netouts, ANCHORS, CLASS_THRESHOLD, INPUT_H, INPUT_W,
+                          class_filter=[LABELS.index("person")])
+
+    correct_yolo_boxes(boxes, image_h, image_w, INPUT_H, INPUT_W, letterbox=letterbox)
+    do_nms(boxes, 0.5)
+
+    return get_boxes(boxes, LABELS, CLASS_THRESHOLD)
+
+
+def detect_frame(model, frame, in_memory=True):
+    """
+    Run the detector on a single decoded frame.
+    :param model: The loaded YOLOv3 model
+    :param frame: BGR frame as returned by cv2.VideoCapture.read
+    :param in_memory: Letterbox the frame directly rather than round-tripping it through frame.jpg
+    :return: The boxes, labels and scores above the class threshold, and the image to draw on
+    """
+    if in_memory:
+        image_h, image_w, _ = frame.shape
+        image = preprocess_frame(frame, INPUT_H, INPUT_W)
+    else:
         cv2.imwrite("frame.jpg", frame)
+        image, image_w, image_h = load_image_pixels("frame.jpg", (INPUT_W, INPUT_H))
+        frame = cv2.imread("frame.jpg")
+
+    yhat = model.predict(image)
+
+    v_boxes, v_labels, v_scores = postprocess([out[0] for out in yhat], image_h, image_w, letterbox=in_memory)
+    return v_boxes, v_labels, v_scores, frame
 
-        image, image_w, image_h = load_image_pixels("frame.jpg", (input_w, input_h))
-        yhat = model.predict(image)
 
-        boxes = list()
+def detect_batch(model, frames):
+    """
+    Run the detector on several decoded frames with a single predict call.
+    :param model: The loaded YOLOv3 model
+    :param frames: List of BGR frames, all decoded from the same video
+    :return: One (boxes, labels, scores) tuple per frame, in the order the frames were given
+    """
+    images = np.empty((len(frames), INPUT_H, INPUT_W, 3), dtype='float32')
+    for k, frame in enumerate(frames):
+        preprocess_frame(frame, INPUT_H, INPUT_W, out=images[k])
 
-        for i in range(len(yhat)):
-            boxes += decode_netout(yhat[i][0], anchors[i], class_threshold, input_h, input_w)
+    yhat = model.predict(images, batch_size=len(frames))
 
-        correct_yolo_boxes(boxes, image_h, image_w, input_h, input_w)
-        do_nms(boxes, 0.5)
+    # each output scale holds the whole batch, so take the k-th slice of every scale
+    return [postprocess([out[k] for out in yhat], frame.shape[0], frame.shape[1])
+            for k, frame in enumerate(frames)]
 
-        v_boxes, v_labels, v_scores = get_boxes(boxes, labels, class_threshold)
 
-        # load the image
-        image = cv2.imread("frame.jpg")
+def read_batches(cap, batch_size, max_frames=None):
+    frame_no = 0
+    while max_frames is None or frame_no < max_frames:
+        frames = []
+        while len(frames) < batch_size and (max_frames is None or frame_no < max_frames):
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+            frame_no += 1
+
+        if not frames:
+            return
+        yield frames
+
+        if len(frames) < batch_size:
+            return
+
+
+def process_video(v_filename, model=None, in_memory=True, show=True, output='project.mp4', codec='DIVX', fps=None, save_frames=False, detections=None, max_frames=None, keyframe_interval=1, propagate=True, start_frame=0):
+    """
+    Detect and draw players on every frame of a video.
+    :param in_memory: Pass decoded frames straight to the network instead of through JPEG files
+    :param show: Display each annotated frame
+    :param output: Video file the annotated frames are streamed to, None to not write one
+    :param codec: FourCC of the output video
+    :param fps: Frame rate of the output video, that of the input if None
+    :param save_frames: Also write each annotated frame to frameN.jpg
+    :param detections: HDF5 file to store each frame's detections in for the tracker, None to not store them
+    :param max_frames: Stop after this many frames, None for the whole video
+    :param keyframe_interval: Run the detector at least every this many frames, 1 for every frame
+    :param propagate: Carry the boxes of each keyframe through the frames in between with optical flow
+    :param start_frame: Frame to start from, the store then holds the frames from there on
+    :return: The number of frames processed per second
+    """
+    if model is None:
+        model = load_model('model.h5')
+
+    cap = cv2.VideoCapture(v_filename)
+    if start_frame:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+    sink = VideoSink(output, fps or cap.get(cv2.CAP_PROP_FPS) or 30, codec, save_frames)
+    store = DetectionWriter(detections, v_filename, start_frame=start_frame) if detections is not None else None
+    scheduler = KeyframeScheduler(keyframe_interval, propagate=propagate) if keyframe_interval > 1 else None
+    frame_no = 0
+    start = time.perf_counter()
+
+    while cap.isOpened() and (max_frames is None or frame_no < max_frames):
+        ret, frame = cap.read()
+        if not ret:
+            break
 
-        # plot each box
-        for i in range(len(v_boxes)):
-            box = v_boxes[i]
-            # get coordinates
-            y1, x1, y2, x2 = box.ymin, box.xmin, box.ymax, box.xmax
-            # calculate width and height of the box
-            width, height = x2 - x1, y2 - y1
+        keyframe = scheduler is None or scheduler.update(frame)
+        if keyframe:
+            v_boxes, v_labels, v_scores, image = detect_frame(model, frame, in_memory)
+            if scheduler is not None:
+                scheduler.keyframe(v_boxes)
+        else:
+            v_boxes, image = scheduler.carried(), frame
+            v_labels = [LABELS[label] for label in v_boxes['label']]
+            v_scores = v_boxes['score'] * 100
 
-            label = "%s (%.3f)" % (v_labels[i] + str(i), v_scores[i])
-            # create the shape
-            image = cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(image, label, (x1, y1-10), cv2.FONT_HERSHEY_SIMPLEX, 0.9, (36,255,12), 2)
+        if store is not None:
+            store.append(v_boxes, keyframe)
 
+        image = annotate_image(image, v_boxes, v_labels, v_scores)
+
+        image_h, image_w = image.shape[:2]
         image = cv2.resize(image, (image_w // 2, image_h // 2))
-        # show the plot
-        cv2.imshow('frame', image)
-        cv2.imwrite("frame" + str(frame_no) + ".jpg", image)
+
+        sink.write(image)
         frame_no += 1
 
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
+        if show:
+            # show the plot
+            cv2.imshow('frame', image)
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                break
+
+    throughput = frame_no / (time.perf_counter() - start)
 
     cap.release()
-    cv2.destroyAllWindows()
-    save_video()
+    if show:
+        cv2.destroyAllWindows()
 
+    sink.release()
+    if store is not None:
+        store.close()
+    if scheduler is not None:
+        scheduler.report()
+    return throughput
 
-def save_video(n):
-    img_array = []
-    for f in range(n):
-        img = cv2.imread("frame" + str(f) + ".jpg")
-        h, w, l = img.shape
-        size = (w, h)
-        img_array.append(img)
 
-    out = cv2.VideoWriter('project.mp4', cv2.VideoWriter_fourcc(*'DIVX'), 30, size)
+def benchmark_frame_io(v_filename, n_frames=200):
+    """
+    Compare frames per second of the JPEG round-trip path against the in-memory path.
+    """
+    model = load_model('model.h5')
+
+    disk_fps = process_video(v_filename, model, in_memory=False, show=False, output=None, max_frames=n_frames)
+    memory_fps = process_video(v_filename, model, in_memory=True, show=False, output=None, max_frames=n_frames)
+
+    print("JPEG round-trip: %.2f frames/s" % disk_fps)
+    print("In-memory:       %.2f frames/s" % memory_fps)
+    print("Speed up:        %.2fx (+%.2f frames/s)" % (memory_fps / disk_fps, memory_fps - disk_fps))
+    return disk_fps, memory_fps
+
+
+def process_video_batched(v_filename, batch_size=8, model=None, output='project.mp4', codec='DIVX', fps=None, save_frames=False, detections=None, max_frames=None):
+    """
+    Offline detection reading batch_size frames ahead and running them through the network together.
+    :return: The number of frames processed per second
+    """
+    if model is None:
+        model = load_model('model.h5')
+
+    cap = cv2.VideoCapture(v_filename)
+    sink = VideoSink(output, fps or cap.get(cv2.CAP_PROP_FPS) or 30, codec, save_frames)
+    store = DetectionWriter(detections, v_filename) if detections is not None else None
+    frame_no = 0
+    start = time.perf_counter()
+
+    for frames in read_batches(cap, batch_size, max_frames):
+        for frame, (v_boxes, v_labels, v_scores) in zip(frames, detect_batch(model, frames)):
+            if store is not None:
+                store.append(v_boxes)
+
+            image = annotate_image(frame, v_boxes, v_labels, v_scores)
+
+            image_h, image_w = image.shape[:2]
+            image = cv2.resize(image, (image_w // 2, image_h // 2))
+
+            sink.write(image)
+            frame_no += 1
+
+    throughput = frame_no / (time.perf_counter() - start)
+    cap.release()
+
+    sink.release()
+    if store is not None:
+        store.close()
+    return throughput
+
+
+def process_video_threaded(v_filename, model=None, output='project.mp4', codec='DIVX', fps=None, save_frames=False, detections=None, max_frames=None, queue_size=8):
+    """
+    Decode, inference and drawing/output each in their own thread, joined by bounded queues.
+    Prints the time each stage spent working and stalled, and its queue depth.
+    Runs on standalone Keras 2 over TensorFlow 1, where the predict function must be built before
+    another thread calls it, and on tf.keras 2, where predict is safe to call from any thread.
+    :return: The number of frames processed per second
+    """
+    if model is None:
+        model = load_model('model.h5')
+
+    # Keras on TensorFlow 1 builds the predict function lazily in the thread that first calls it,
+    # which is then outside the graph the model was loaded into
+    if hasattr(model, '_make_predict_function'):
+        model._make_predict_function()
 
-    for i in range(len(img_array)):
-        out.write(img_array[i])
-    out.release()
+    cap = cv2.VideoCapture(v_filename)
+    sink = VideoSink(output, fps or cap.get(cv2.CAP_PROP_FPS) or 30, codec, save_frames)
+    store = DetectionWriter(detections, v_filename) if detections is not None else None
+
+    def read():
+        frame_no = 0
+        while max_frames is None or frame_no < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                return
+            yield frame_no, frame
+            frame_no += 1
+
+    def infer(item):
+        frame_no, frame = item
+        return (frame_no,) + detect_frame(model, frame)
+
+    def write(item):
+        frame_no, v_boxes, v_labels, v_scores, image = item
+        if store is not None:
+            store.append(v_boxes)
+
+        image = annotate_image(image, v_boxes, v_labels, v_scores)
+
+        image_h, image_w = image.shape[:2]
+        image = cv2.resize(image, (image_w // 2, image_h // 2))
+
+        sink.write(image)
+
+    pipeline = Pipeline(read, [('inference', infer), ('writer', write)], maxsize=queue_size)
+    try:
+        elapsed = pipeline.run()
+        pipeline.report()
+    finally:
+        cap.release()
+        sink.release()
+        if store is not None:
+            store.close()
+
+    return pipeline.stages[-1].items / elapsed
+
+
+def benchmark_batch_sizes(v_filename, batch_sizes=(1, 2, 4, 8, 16), n_frames=128):
+    """
+    Report detection throughput for each batch size over the same frames.
+    """
+    model = load_model('model.h5')
+    results = {}
+
+    for batch_size in batch_sizes:
+        results[batch_size] = process_video_batched(v_filename, batch_size, model, output=None, max_frames=n_frames)
+        print("Batch size %3d: %.2f frames/s" % (batch_size, results[batch_size]))
+
+    return results
+
+
+class VideoSink:
+    """
+    Streams annotated frames into a cv2.VideoWriter as they are produced, so memory use stays
+    constant however long the video is. The writer is opened on the first frame to take its size.
+    :param filename: Output video, None to skip writing a video
+    :param save_frames: Also write every frame to frameN.jpg
+    """
+
+    def __init__(self, filename='project.mp4', fps=30, codec='DIVX', save_frames=False):
+        self.filename = filename
+        self.fps = fps
+        self.codec = codec
+        self.save_frames = save_frames
+        self.writer = None
+        self.count = 0
+
+    def write(self, image):
+        if self.filename is not None:
+            if self.writer is None:
+                h, w = image.shape[:2]
+                self.writer = cv2.VideoWriter(self.filename, cv2.VideoWriter_fourcc(*self.codec), self.fps, (w, h))
+            self.writer.write(image)
+
+        if self.save_frames:
+            cv2.imwrite("frame" + str(self.count) + ".jpg", image)
+        self.count += 1
+
+    def release(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+
+
+# join frame0.jpg ... frame(n-1).jpg from an earlier run into a video, one frame in memory at a time
+def save_video(n, filename='project.mp4', fps=30, codec='DIVX'):
+    sink = VideoSink(filename, fps, codec)
+
+    for f in range(n):
+        sink.write(cv2.imread("frame" + str(f) + ".jpg"))
+    sink.release()
 
 
-process_video("wales_vs_ireland_edit.mp4")
-#save_video(2000)
+if __name__ == '__main__':
+    process_video("wales_vs_ireland_edit.mp4")
+    #save_video(2000)
 # # load yolov3 model
 # model = load_model('model.h5')
 # # define the expected input shape for the model
@@ -265,10 +427,8 @@ process_video("wales_vs_ireland_edit.mp4")
 # anchors = [[116,90, 156,198, 373,326], [30,61, 62,45, 59,119], [10,13, 16,30, 33,23]]
 # # define the probability threshold for detected objects
 # class_threshold = 0.6
-# boxes = list()
-# for i in range(len(yhat)):
-#     # decode the output of the network
-#     boxes += decode_netout(yhat[i][0], anchors[i], class_threshold, input_h, input_w)
+# # decode the output of the network
+# boxes = decode_netout([out[0] for out in yhat], anchors, class_threshold, input_h, input_w)
 # # correct the sizes of the bounding boxes for the shape of the image
 # correct_yolo_boxes(boxes, image_h, image_w, input_h, input_w)
 # # suppress non-maximal boxes
@@ -9,6 +9,8 @@ from keras.models import Model
 import struct
 import cv2
 
+from boxes import decode_netout, correct_yolo_boxes, do_nms
+
 np.set_printoptions(threshold=np.nan)
 os.environ["CUDA_DEVICE_ORDER"]="PCI_BUS_ID"
 os.environ["CUDA_VISIBLE_DEVICES"]="0"
@@ -77,33 +79,6 @@ class WeightReader:
         self.offset = 0
 
 
-class BoundBox:
-
-    def __init__(self, xmin, ymin, xmax, ymax, objness=None, classes=None):
-        self.xmin = xmin
-        self.ymin = ymin
-        self.xmax = xmax
-        self.ymax = ymax
-
-        self.objness = objness
-        self.classes = classes
-
-        self.label = -1
-        self.score = -1
-
-    def get_label(self):
-        if self.label == -1:
-            self.label = np.argmax(self.classes)
-
-        return self.label
-
-    def get_score(self):
-        if self.score == -1:
-            self.score = self.classes[self.get_label()]
-
-        return self.score
-
-
 def _conv_block(inp, convs, skip=True):
     x = inp
     count = 0
@@ -128,40 +103,6 @@ def _conv_block(inp, convs, skip=True):
     return add([skip_connection, x]) if skip else x
 
 
-def _interval_overlap(interval_a, interval_b):
-    x1, x2 = interval_a
-    x3, x4 = interval_b
-
-    if x3 < x1 :
-        if x4 < x1:
-            return 0
-        else:
-            return min(x2, x4) - x1
-    else:
-        if x2 < x3:
-            return 0
-        else:
-            return min(x2, x4) - x3
-
-
-def _sigmoid(x):
-    return 1. / (1. + np.exp(-x))
-
-
-def bbox_iou(box1, box2):
-    intersect_w = _interval_overlap([box1.xmin, box1.xmax], [box2.xmin, box2.xmax])
-    intersect_h = _interval_overlap([box1.ymin, box1.ymax], [box2.ymin, box2.ymax])
-
-    intersect = intersect_w * intersect_h
-
-    w1, h1 = box1.xmax-box1.xmin, box1.ymax-box1.ymin
-    w2, h2 = box2.xmax-box2.xmin, box2.ymax-box2.ymin
-
-    union = w1*h1 + w2*h2 - intersect
-
-    return float(intersect) / union
-
-
 def make_yolov3_model():
     input_image = Input(shape=(None, None, 3))
 
@@ -278,94 +219,22 @@ def preprocess_input(image, net_h, net_w):
     return new_image
 
 
-def decode_netout(netout, anchors, obj_thresh, nms_thresh, net_h, net_w):
-    grid_h, grid_w = netout.shape[:2]
-    nb_box = 3
-    netout = netout.reshape((grid_h, grid_w, nb_box, -1))
-    nb_class = netout.shape[-1] - 5
-
-    boxes = []
-
-    netout[..., :2] = _sigmoid(netout[..., :2])
-    netout[..., 4:] = _sigmoid(netout[..., 4:])
-    netout[..., 5:] = netout[..., 4][..., np.newaxis] * netout[..., 5:]
-    netout[..., 5:] *= netout[..., 5:] > obj_thresh
-
-    for i in range(grid_w*grid_h):
-        row = i / grid_w
-        col = i % grid_w
-
-        for b in range(nb_box):
-            objectness = netout[int(row)][int(col)][b][:4]
-
-            x = (col + x) / grid_w
-            y = (row + y) / grid_h
-            w = anchors[2 * b + 0] * np.exp(w) / net_w
-            h = anchors[2 * b + 1] * np.exp(h) / net_h
-
-            classes = netout[int(row)][col][b][5:]
-
-            box = BoundBox(x-w/2, y-h/2, x+w/2, y+h/2, objectness, classes)
-
-            boxes.append(box)
-    return boxes
-
-
-def correct_yolo_boxes(boxes, image_h, image_w, net_h, net_w):
-    if (float(net_w)/image_w) < (float(net_h)/image_h):
-        new_w = net_w
-        new_h = (image_h*net_w)/image_w
-    else:
-        new_h = net_w
-        new_w = (image_w*net_h)/image_h
-
-    for i in range(len(boxes)):
-        x_offset, x_scale = (net_w - new_w)/2./net_w, float(new_w)/net_w
-        y_offset, y_scale = (net_h - new_h)/2./net_h, float(new_h)/net_h
-
-        boxes[i].xmin = int((boxes[i].xmin - x_offset) / x_scale * image_w)
-        boxes[i].xmax = int((boxes[i].xmax - x_offset) / x_scale * image_w)
-        boxes[i].ymin = int((boxes[i].ymin - y_offset) / y_scale * image_h)
-        boxes[i].ymax = int((boxes[i].ymax - y_offset) / y_scale * image_h)
-
-
-def do_nms(boxes, nms_thresh):
-    if len(boxes) > 0:
-        nb_class = len(boxes[0].classes)
-    else:
-        return
-
-    for c in range(nb_class):
-        sorted_indices = np.argsort([-box.classes[c] for box in boxes])
-
-        for i in range(len(sorted_indices)):
-            index_i = sorted_indices[i]
-
-            if boxes[index_i].classes[c] == 0: continue
-
-            for j in range(i+1, len(sorted_indices)):
-                index_j = sorted_indices[j]
-
-                if bbox_iou(boxes[index_i], boxes[index_j]) >= nms_thresh:
-                    boxes[index_j].classes[c] = 0
-
-
 def draw_boxes(image, boxes, labels, obj_thresh):
     for box in boxes:
         label_str = ''
         label = -1
 
-        for i in range(len(labels)):
-            if box.classes[i] > obj_thresh:
-                label_str += labels[i]
-                label = i
-                print(labels[i] + ': ' + str(box.classes[i]*100) + '%')
+        if box['score'] > obj_thresh:
+            label_str += labels[box['label']]
+            label = box['label']
+            print(labels[label] + ': ' + str(box['score']*100) + '%')
 
         if label >= 0:
-            cv2.rectangle(image, (box.xmin, box.ymin), (box.xmax, box.ymax), (0,255,0), 3)
+            xmin, ymin, xmax, ymax = int(box['xmin']), int(box['ymin']), int(box['xmax']), int(box['ymax'])
+            cv2.rectangle(image, (xmin, ymin), (xmax, ymax), (0,255,0), 3)
             cv2.putText(image,
-                        label_str + ' ' + str(box.get_score()),
-                        (box.xmin, box.ymin-13),
+                        label_str + ' ' + str(box['score']),
+                        (xmin, ymin-13),
                         cv2.FONT_HERSHEY_SIMPLEX,
                         1e-3 * image.shape[0],
                         (0,255,0), 2)
@@ -402,12 +271,9 @@ def draw_boxes(image, boxes, labels, obj_thresh):
         new_image = preprocess_input(image, net_h, net_w)
 
         yolos = yolov3.predict(new_image)
-        boxes = []
-
-        for i in range(len(yolos)):
-            boxes += decode_netout(yolos[i][0], anchors[i], obj_thresh, nms_thresh, net_h, net_w)
+        boxes = decode_netout([out[0] for out in yolos], anchors, obj_thresh, net_h, net_w)
 
-        correct_yolo_boxes(boxes, image_h, image_w, net_h, net_w)
+        correct_yolo_boxes(boxes, image_h, image_w, net_h, net_w, letterbox=True)
 
         do_nms(boxes, nms_thresh)
 
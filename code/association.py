@@ -0,0 +1,76 @@
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+
+def gated_pairs(estimates, points, gate):
+    """
+    Every track/detection pair closer than the gate, found with KD-trees rather than a dense
+    distance matrix.
+    :return: Track indexes, detection indexes and distances of the pairs
+    """
+    if len(estimates) == 0 or len(points) == 0:
+        return np.empty(0, dtype=int), np.empty(0, dtype=int), np.empty(0)
+
+    pairs = cKDTree(estimates).sparse_distance_matrix(cKDTree(points), gate, output_type='ndarray')
+    return pairs['i'].astype(int), pairs['j'].astype(int), pairs['v']
+
+
+def associate(estimates, points, gate):
+    """
+    Match tracks to detections, only considering pairs within the gate. Tracks and detections that
+    share gated pairs form connected components and each component is assigned on its own, so the
+    cost grows with the size of the clusters rather than the total number of detections.
+    :param estimates: (T, 2) current track positions
+    :param points: (D, 2) detection positions
+    :param gate: Largest distance a track may move to a detection
+    :return: Matched track and detection indexes, then the unmatched tracks and detections
+    """
+    estimates = np.asarray(estimates, dtype=float).reshape(-1, 2)
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    T, D = len(estimates), len(points)
+
+    tracks, detections, dists = gated_pairs(estimates, points, gate)
+    rows, cols = [], []
+
+    if len(dists):
+        # Tracks are nodes 0..T-1 and detections T..T+D-1 of one bipartite graph
+        graph = coo_matrix((np.ones(len(dists)), (tracks, detections + T)), shape=(T + D, T + D))
+        _, labels = connected_components(graph, directed=False)
+
+        edge_labels = labels[tracks]
+        sizes = np.bincount(edge_labels)
+
+        # Components made of a single gated pair need no assignment at all
+        single = sizes[edge_labels] == 1
+        rows.append(tracks[single])
+        cols.append(detections[single])
+
+        shared = np.flatnonzero(~single)
+        order = shared[np.argsort(edge_labels[shared], kind='stable')]
+        splits = np.flatnonzero(np.diff(edge_labels[order])) + 1
+
+        for edges in np.split(order, splits) if len(order) else []:
+            comp_tracks, t = np.unique(tracks[edges], return_inverse=True)
+            comp_points, d = np.unique(detections[edges], return_inverse=True)
+
+            # A pair outside the gate costs more than all gated pairs together, so as many gated pairs as possible are used
+            cost = np.full((len(comp_tracks), len(comp_points)), gate * (len(edges) + 1))
+            cost[t, d] = dists[edges]
+
+            r, c = linear_sum_assignment(cost)
+            valid = cost[r, c] <= gate
+            rows.append(comp_tracks[r[valid]])
+            cols.append(comp_points[c[valid]])
+
+    rows = np.concatenate(rows) if rows else np.empty(0, dtype=int)
+    cols = np.concatenate(cols) if cols else np.empty(0, dtype=int)
+
+    unmatched_tracks = np.ones(T, dtype=bool)
+    unmatched_tracks[rows] = False
+    unmatched_points = np.ones(D, dtype=bool)
+    unmatched_points[cols] = False
+
+    return rows, cols, np.flatnonzero(unmatched_tracks), np.flatnonzero(unmatched_points)
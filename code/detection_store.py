@@ -0,0 +1,54 @@
+import h5py
+import numpy as np
+
+
+class DetectionStore:
+    """
+    Lazy reader for the per-frame player detections written by the YOLO stage
+    (YOLOv3Prototype/detection_store.py). Only the frame offsets are held in memory,
+    the rows of a frame are read from the file when that frame is requested.
+    """
+
+    def __init__(self, filename):
+        self.file = h5py.File(filename, 'r')
+        self.video = self.file.attrs['video']
+
+        self.boxes = self.file['boxes']
+        self.scores = self.file['scores']
+        self.offsets = self.file['offsets'][:]
+
+        # Stores written before keyframe mode have a detection on every frame
+        self.keyframes = self.file['keyframes'][:] if 'keyframes' in self.file else np.ones(len(self.offsets) - 1, dtype=bool)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def rows(self, frame_no):
+        return self.offsets[frame_no], self.offsets[frame_no + 1]
+
+    def __getitem__(self, frame_no):
+        """
+        :param frame_no: Index of the frame in the video
+        :return: (N, 4) float32 array of xmin, ymin, xmax, ymax, empty past the end of the store
+        """
+        if not 0 <= frame_no < len(self):
+            return np.empty((0, 4), np.float32)
+
+        start, end = self.rows(frame_no)
+        return self.boxes[start:end]
+
+    def is_keyframe(self, frame_no):
+        """
+        :return: Whether the detector ran on the frame, False past the end of the store
+        """
+        return 0 <= frame_no < len(self) and bool(self.keyframes[frame_no])
+
+    def get_scores(self, frame_no):
+        if not 0 <= frame_no < len(self):
+            return np.empty(0, np.float32)
+
+        start, end = self.rows(frame_no)
+        return self.scores[start:end]
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,105 @@
+import numpy as np
+import cv2
+
+# Frames a track may go without a measurement before it is dropped
+MAX_COASTING = 30
+
+
+class FilterBank:
+    """
+    Track bookkeeping shared by the filter backends. Every per-track array has the track slot as
+    its first axis, active tracks are packed into the first P slots, removing a track moves the
+    last ones into its place and the arrays only grow when the capacity runs out.
+    Subclasses name their own per-track arrays in STATE and fill new slots in _start.
+    """
+
+    STATE = ()
+
+    def __init__(self, capacity):
+        self.P = 0
+        self.delta_time = np.zeros(capacity, dtype=int)
+        self.bayes_draw = np.zeros(capacity, dtype=bool)
+
+        # Stable id of the track in each slot, slots move around as tracks are removed
+        self.ids = np.full(capacity, -1)
+        self.next_id = 0
+
+    def __len__(self):
+        return self.P
+
+    def _names(self):
+        return self.STATE + ('delta_time', 'bayes_draw', 'ids')
+
+    def _arrays(self):
+        return [getattr(self, name) for name in self._names()]
+
+    def _grow(self, capacity):
+        for name, arr in zip(self._names(), self._arrays()):
+            setattr(self, name, np.concatenate((arr, np.empty((capacity - len(arr),) + arr.shape[1:], arr.dtype))))
+
+    def _start(self, new, positions):
+        """
+        Fill the state of the tracks in the new slots, P still counts only the existing tracks.
+        """
+        raise NotImplementedError
+
+    def add(self, positions):
+        """
+        Start a track at each position.
+        :return: The ids of the new tracks
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 2)
+        k = len(positions)
+
+        if self.P + k > len(self.ids):
+            self._grow(max(2 * len(self.ids), self.P + k))
+
+        new = slice(self.P, self.P + k)
+        self._start(new, positions)
+        self.delta_time[new] = 0
+        self.bayes_draw[new] = False
+        self.ids[new] = np.arange(self.next_id, self.next_id + k)
+
+        self.next_id += k
+        self.P += k
+        return self.ids[new].copy()
+
+    def remove(self, slots):
+        keep = np.ones(self.P, dtype=bool)
+        keep[slots] = False
+        n = np.count_nonzero(keep)
+
+        # Fill the holes left below n with the surviving tracks above it
+        holes = np.flatnonzero(~keep[:n])
+        movers = np.flatnonzero(keep[n:]) + n
+        for arr in self._arrays():
+            arr[holes] = arr[movers]
+
+        self.P = n
+
+    def clear(self):
+        self.P = 0
+
+    def particle_count(self):
+        return 0
+
+    def _measured(self, slots):
+        self.delta_time[slots] = 0
+        self.bayes_draw[slots] = False
+
+    def update_none(self, slots):
+        """
+        :return: Mask over slots of the tracks that have gone too long without a measurement
+        """
+        self.bayes_draw[slots] = True
+        self.delta_time[slots] += 1
+
+        return self.delta_time[slots] > MAX_COASTING
+
+    def estimate(self):
+        raise NotImplementedError
+
+    def draw(self, image):
+        for (x, y), bayes_draw in zip(self.estimate().astype(int), self.bayes_draw[:self.P]):
+            cv2.circle(image, (int(x), int(y)), 3, (0, 0, 255) if bayes_draw else (255, 0, 0), -1)
+        return image
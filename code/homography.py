@@ -0,0 +1,178 @@
+import cv2
+import numpy as np
+
+
+def project_points(points, H):
+    """
+    Map points through a homography in one call.
+    :param points: (N, 2) points
+    :param H: 3x3 homography
+    :return: (N, 2) float32 projected points
+    """
+    points = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+    if len(points) == 0:
+        return np.empty((0, 2), np.float32)
+
+    return cv2.perspectiveTransform(points, np.asarray(H, dtype=np.float64)).reshape(-1, 2)
+
+
+def project_points_inverse(points, H):
+    """
+    Map points back through a homography, e.g. pitch positions onto the footage H was estimated from.
+    """
+    return project_points(points, np.linalg.inv(H))
+
+
+def project_points_batch(points, Hs):
+    """
+    Project the points of many frames, each with its own homography, in a single matmul.
+    :param points: List with an (N_i, 2) array of points per frame
+    :param Hs: (F, 3, 3) homographies, one per frame
+    :return: List with the (N_i, 2) float32 projected points of each frame
+    """
+    counts = [len(p) for p in points]
+    if sum(counts) == 0:
+        return [np.empty((0, 2), np.float32) for _ in counts]
+
+    flat = np.concatenate([np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in points])
+    frames = np.repeat(np.arange(len(counts)), counts)
+
+    homogeneous = np.concatenate((flat, np.ones((len(flat), 1))), axis=1)
+    projected = np.einsum('nij,nj->ni', np.asarray(Hs, dtype=np.float64)[frames], homogeneous)
+    projected = (projected[:, :2] / projected[:, 2:]).astype(np.float32)
+
+    return np.split(projected, np.cumsum(counts)[:-1])
+
+
+class IncrementalHomography:
+    """
+    Keeps the footage to pitch homography up to date between frames. Most broadcast frames are
+    small pans of the previous one, so H is carried forward through the frame to frame homography
+    of sparse features tracked with Lucas-Kanade flow. The full line based estimate only runs on a
+    scene change, when the camera moves further than motion_thresh pixels or when the flow is lost.
+    Every refinement adds a little error, so a steady pan is also re-anchored on the full estimate
+    once it has travelled reanchor_motion pixels or gone reanchor_every frames since the last one.
+    :param estimate: Function (frame, prior) returning a new H or None, prior is the last good H
+    :param prior: Homography to label the lines of the first frames against
+    :param motion_thresh: Median feature displacement, in full resolution pixels, above which H is re-estimated
+    :param reanchor_motion: Median displacement summed over the refinements, in full resolution pixels,
+    after which H is re-estimated
+    :param reanchor_every: Most refinements in a row before H is re-estimated
+    :param scale: Resolution the features are tracked at
+    """
+
+    def __init__(self, estimate, prior=None, motion_thresh=20., reanchor_motion=150., reanchor_every=50,
+                 max_corners=200, min_tracked=20, scale=0.5):
+        self.estimate = estimate
+        self.prior = prior
+        self.motion_thresh = motion_thresh
+        self.reanchor_motion = reanchor_motion
+        self.reanchor_every = reanchor_every
+        self.max_corners = max_corners
+        self.min_tracked = min_tracked
+        self.scale = scale
+
+        self.H = None
+        self.prev_grey = None
+        self.prev_points = None
+
+        # Refinements and camera motion since H last came from a full estimate
+        self.since_estimate = 0
+        self.travelled = 0.
+
+        self.full_estimates = 0
+        self.refinements = 0
+
+    def reset(self):
+        """
+        Drop the current homography and tracked features, the prior is kept to label lines with.
+        """
+        self.H = None
+        self.reset_flow()
+
+    def reset_flow(self):
+        """
+        Drop the tracked features but keep H, for when frames were skipped and the flow would be
+        measured against a frame that is no longer the previous one.
+        """
+        self.prev_grey = self.prev_points = None
+
+    def anchor(self, frame, H):
+        """
+        Take H as the homography of this frame, e.g. from hand labelled lines, and follow the
+        camera from here.
+        """
+        grey = self._grey(frame)
+        self.H = self.prior = H
+        self.since_estimate, self.travelled = 0, 0.
+        self.prev_grey = grey
+        self.prev_points = cv2.goodFeaturesToTrack(grey, self.max_corners, 0.01, 8)
+        return H
+
+    def _grey(self, frame):
+        grey = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        return cv2.resize(grey, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+
+    def _flow(self, grey):
+        """
+        :return: Homography taking the previous footage frame onto this one, the median feature
+        displacement and the features still tracked; None and inf when the features were lost
+        """
+        if self.prev_points is None or len(self.prev_points) < self.min_tracked:
+            return None, np.inf, None
+
+        points, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_grey, grey, self.prev_points, None)
+        tracked = status.ravel() == 1
+        if np.count_nonzero(tracked) < self.min_tracked:
+            return None, np.inf, None
+
+        old, new = self.prev_points[tracked], points[tracked]
+        motion = np.median(np.linalg.norm(new - old, axis=-1)) / self.scale
+
+        M, inliers = cv2.findHomography(old, new, cv2.RANSAC, 3.)
+        if M is None or np.count_nonzero(inliers) < self.min_tracked:
+            return None, motion, None
+
+        # The flow was measured on the downscaled frames
+        S = np.diag([self.scale, self.scale, 1.])
+        return np.linalg.inv(S) @ M @ S, motion, new[inliers.ravel() == 1]
+
+    def _drifted(self, motion):
+        return self.since_estimate + 1 >= self.reanchor_every or self.travelled + motion >= self.reanchor_motion
+
+    def update(self, frame, scene_changed):
+        """
+        :return: The homography for this frame, None if it could not be estimated
+        """
+        grey = self._grey(frame)
+        M, motion, points = (None, np.inf, None) if scene_changed else self._flow(grey)
+
+        if self.prev_grey is None and self.H is not None and not scene_changed:
+            # Flow was reset, H is kept and the features are picked up again from this frame
+            pass
+        elif self.H is None or M is None or motion > self.motion_thresh or self._drifted(motion):
+            H = self.estimate(frame, self.H if self.H is not None else self.prior)
+            self.full_estimates += 1
+            # A failed estimate is not retried on every frame, the next try waits as long again
+            self.since_estimate, self.travelled = 0, 0.
+
+            if H is not None:
+                self.H = self.prior = H
+            elif M is not None and self.H is not None:
+                # Keep following the camera until the lines are found again
+                self.H = self.H @ np.linalg.inv(M)
+            elif scene_changed:
+                self.H = None
+        else:
+            # Current footage back onto the previous frame, then onto the pitch
+            self.H = self.H @ np.linalg.inv(M)
+            self.refinements += 1
+            self.since_estimate += 1
+            self.travelled += motion
+
+        if points is None or len(points) < self.max_corners // 2:
+            points = cv2.goodFeaturesToTrack(grey, self.max_corners, 0.01, 8)
+
+        self.prev_grey = grey
+        self.prev_points = points
+        return self.H
@@ -0,0 +1,73 @@
+import numpy as np
+
+from code.filter_bank import FilterBank
+
+# Constant velocity model over the state x, y, vx, vy, one frame per step
+F = np.array([[1., 0., 1., 0.],
+              [0., 1., 0., 1.],
+              [0., 0., 1., 0.],
+              [0., 0., 0., 1.]])
+
+# Only the position is measured
+H = np.array([[1., 0., 0., 0.],
+              [0., 1., 0., 0.]])
+
+
+class KalmanFilterBank(FilterBank):
+    """
+    Constant velocity 2-D Kalman filters for every tracked player, states (P, 4) and covariances
+    (P, 4, 4) stepped together as stacked matrix products. A drop-in alternative to
+    ParticleFilterBank: same track bookkeeping, same predict/update/estimate/draw interface.
+    :param p_std: Standard deviation of the initial position
+    :param v_std: Standard deviation of the initial velocity
+    :param q_std: Standard deviation of the per-frame acceleration noise
+    :param r_std: Standard deviation of the measurement noise
+    """
+
+    STATE = ('x', 'cov')
+
+    def __init__(self, capacity=32, p_std=1., v_std=5., q_std=1., r_std=1.):
+        FilterBank.__init__(self, capacity)
+        self.initial_cov = np.diag([p_std ** 2, p_std ** 2, v_std ** 2, v_std ** 2])
+        self.R = np.eye(2) * r_std ** 2
+
+        # Discrete white noise acceleration
+        g = np.array([[0.5, 0.], [0., 0.5], [1., 0.], [0., 1.]])
+        self.Q = g @ g.T * q_std ** 2
+
+        self.x = np.empty((capacity, 4))
+        self.cov = np.empty((capacity, 4, 4))
+
+    def _start(self, new, positions):
+        # New tracks start at rest
+        self.x[new, :2] = positions
+        self.x[new, 2:] = 0
+        self.cov[new] = self.initial_cov
+
+    def predict(self):
+        x, cov = self.x[:self.P], self.cov[:self.P]
+
+        x[:] = x @ F.T
+        cov[:] = F @ cov @ F.T + self.Q
+
+    def update(self, slots, z):
+        """
+        :param slots: Slots of the tracks that received a measurement
+        :param z: (len(slots), 2) measured positions
+        """
+        x, cov = self.x[slots], self.cov[slots]
+
+        innovation = np.asarray(z, dtype=float) - x[:, :2]
+        S = cov[:, :2, :2] + self.R
+        K = cov[:, :, :2] @ np.linalg.inv(S)
+
+        self.x[slots] = x + (K @ innovation[..., np.newaxis])[..., 0]
+        self.cov[slots] = cov - K @ cov[:, :2, :]
+        self._measured(slots)
+
+    def resample(self, slots=None):
+        # Nothing to resample, kept so the banks are interchangeable
+        pass
+
+    def estimate(self):
+        return self.x[:self.P, :2].copy()
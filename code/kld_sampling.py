@@ -0,0 +1,41 @@
+"""
+KLD-sampling (Fox, 2003): choose the number of particles so that, with probability 1 - delta,
+the error between the sampled and the true posterior stays below epsilon. The bound depends on
+the number k of histogram bins the particles occupy, so tight posteriors need few particles and
+spread out or multimodal ones need many.
+"""
+import numpy as np
+import scipy.stats
+
+_EMPTY = np.iinfo(np.int64).max
+
+
+def occupied_bins(particles, mask, bin_size):
+    """
+    :param particles: (P, N, 2) particle positions
+    :param mask: (P, N) particles to count
+    :param bin_size: Width of the square histogram bins, in pitch units
+    :return: (P,) number of distinct bins holding at least one counted particle
+    """
+    cells = np.floor(particles / bin_size).astype(np.int64)
+    codes = cells[..., 0] * 1000003 + cells[..., 1]
+    codes = np.sort(np.where(mask, codes, _EMPTY), axis=1)
+
+    new = np.ones(codes.shape, dtype=bool)
+    new[:, 1:] = codes[:, 1:] != codes[:, :-1]
+    return np.count_nonzero(new & (codes != _EMPTY), axis=1)
+
+
+def kld_sample_size(k, epsilon=0.05, delta=0.01):
+    """
+    :param k: Array of occupied bin counts
+    :return: Number of particles needed for each k, 1 where k <= 1
+    """
+    k = np.asarray(k, dtype=float)
+    z = scipy.stats.norm.ppf(1 - delta)
+
+    dof = np.maximum(k - 1, 1)
+    a = 2 / (9 * dof)
+    n = dof / (2 * epsilon) * (1 - a + np.sqrt(a) * z) ** 3
+
+    return np.where(k > 1, np.ceil(n), 1).astype(int)
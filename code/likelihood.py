@@ -0,0 +1,55 @@
+import numpy as np
+
+
+class GaussianLikelihood:
+    """
+    Gaussian likelihood of each particle given a measured position, turned straight into
+    normalised weights. Intermediate arrays are kept between calls and reused whenever the
+    next call fits in them, so a steady number of tracks allocates nothing per update.
+    :param sigma: Standard deviation of the measurement noise, in pitch units
+    :param log: Normalise in log space (subtracting the largest log-weight) so far away
+                measurements never underflow every weight to zero
+    """
+
+    def __init__(self, sigma=1., log=False):
+        self.sigma = sigma
+        self.log = log
+        self._buffers = {}
+
+    def _buffer(self, name, shape):
+        size = int(np.prod(shape))
+        buffer = self._buffers.get(name)
+
+        if buffer is None or buffer.size < size:
+            buffer = self._buffers[name] = np.empty(size)
+        return buffer[:size].reshape(shape)
+
+    def __call__(self, particles, z, out=None):
+        """
+        :param particles: (..., N, 2) particle positions
+        :param z: (..., 2) measured position for each set of particles
+        :param out: Array to write the weights to, an internal buffer if None
+        :return: (..., N) weights summing to one along the last axis
+        """
+        particles = np.asarray(particles)
+        z = np.asarray(z, dtype=float)
+
+        diff = self._buffer('diff', particles.shape)
+        if out is None:
+            out = self._buffer('out', particles.shape[:-1])
+
+        np.subtract(particles, z[..., np.newaxis, :], out=diff)
+        np.square(diff, out=diff)
+        np.sum(diff, axis=-1, out=out)
+        out *= -0.5 / self.sigma ** 2
+
+        # The Gaussian normalising constant cancels when the weights are normalised
+        if self.log:
+            out -= out.max(axis=-1, keepdims=True)
+            np.exp(out, out=out)
+        else:
+            np.exp(out, out=out)
+            out += 1e-300
+
+        out /= out.sum(axis=-1, keepdims=True)
+        return out
@@ -0,0 +1,35 @@
+import h5py
+import numpy as np
+
+
+class LineAnnotations:
+    """
+    Hand labelled pitch lines of a few frames of a video, used to start the homography without a
+    prior: the first frame of the video, and any scene the line detector cannot label on its own.
+
+    Layout:
+        segments (rows, 4) float32  x1, y1, x2, y2 of a pitch line in footage pixels
+        labels   (rows,)   int      Lines value of the pitch line each segment lies on
+        frames   (rows,)   int      frame number each segment was labelled on
+    """
+
+    def __init__(self, filename):
+        with h5py.File(filename, 'r') as f:
+            segments = f['segments'][:].reshape(-1, 4)
+            labels = f['labels'][:].astype(int)
+            frames = f['frames'][:].astype(int)
+
+        # A handful of frames at most, held in memory grouped by frame
+        self.frames = {}
+        for frame_no in np.unique(frames):
+            rows = frames == frame_no
+            self.frames[int(frame_no)] = segments[rows], labels[rows]
+
+    def __contains__(self, frame_no):
+        return frame_no in self.frames
+
+    def __getitem__(self, frame_no):
+        """
+        :return: (K, 4) segments and (K,) labels of the frame, empty if it was not annotated
+        """
+        return self.frames.get(frame_no, (np.empty((0, 4), np.float32), np.empty(0, dtype=int)))
@@ -0,0 +1,72 @@
+"""
+Vectorised geometry of detected pitch lines. Segments become rows of a, b, c (the line
+ax + by + c = 0) followed by their end points, and duplicates and intersections are found over
+all lines at once instead of pair by pair.
+"""
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+
+def segments_to_equations(lines, min_length=10):
+    """
+    :param lines: (L, 1, 4) or (L, 4) segments x1, y1, x2, y2 as returned by HoughLinesP
+    :return: (M, 7) rows of a, b, c, x1, y1, x2, y2 for the segments at least min_length long
+    """
+    segments = np.asarray(lines, dtype=float).reshape(-1, 4)
+    x1, y1, x2, y2 = segments.T
+    keep = np.hypot(x2 - x1, y2 - y1) >= min_length
+
+    equations = np.column_stack((y1 - y2, x2 - x1, x1 * y2 - x2 * y1, segments))
+    return equations[keep]
+
+
+def deduplicate(equations, angle_tol=np.deg2rad(2), dist_tol=5.):
+    """
+    Collapse near identical lines, keeping the longest segment of each cluster. Two lines are
+    duplicates when their directions are within angle_tol and their distances from the origin
+    within dist_tol, clusters are the connected components of that relation.
+    :param equations: (M, 7) rows from segments_to_equations
+    """
+    if len(equations) < 2:
+        return equations
+
+    norm = np.hypot(equations[:, 0], equations[:, 1])
+    normals = equations[:, :2] / norm[:, np.newaxis]
+    rho = equations[:, 2] / norm
+
+    # The same line can come out with either orientation of its normal
+    cos = normals @ normals.T
+    sign = np.where(cos < 0, -1., 1.)
+    duplicate = (np.abs(cos) >= np.cos(angle_tol)) & (np.abs(rho[:, np.newaxis] - sign * rho) <= dist_tol)
+
+    i, j = np.nonzero(np.triu(duplicate, 1))
+    n = len(equations)
+    _, labels = connected_components(coo_matrix((np.ones(len(i)), (i, j)), shape=(n, n)), directed=False)
+
+    # Longest segment first, then the first of each cluster in that order
+    order = np.argsort(-norm, kind='stable')
+    _, first = np.unique(labels[order], return_index=True)
+    return equations[np.sort(order[first])]
+
+
+def intersections(lines):
+    """
+    Intersections of every pair of differently labelled lines.
+    :param lines: (L, >=4) rows starting t, a, b, c, lines labelled -1 are ignored
+    :return: (K, 4) rows of min(t1, t2), max(t1, t2), x, y
+    """
+    lines = np.asarray(lines, dtype=float)
+    i, j = np.triu_indices(len(lines), 1)
+    t1, a1, b1, c1 = lines[i, :4].T
+    t2, a2, b2, c2 = lines[j, :4].T
+
+    det = a1 * b2 - a2 * b1
+    valid = (t1 != t2) & (t1 != -1) & (t2 != -1) & (det != 0)
+    det = np.where(valid, det, 1)
+
+    x = (b1 * c2 - b2 * c1) / det
+    y = (a2 * c1 - a1 * c2) / det
+
+    out = np.column_stack((np.minimum(t1, t2), np.maximum(t1, t2), x, y))
+    return out[valid]
@@ -0,0 +1,165 @@
+"""
+Live tracking with a bounded delay. The capture thread only ever keeps the newest frame, so a
+slow frame makes the tracker skip ahead rather than fall further behind. Each frame is timed
+from capture to overlay, and when that goes over the budget the tracker gives up work in steps:
+first the homography refinement, then half the particle budget, then the detector on alternate
+frames. It climbs back once there is room again.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Work given up at each level, in order
+LEVELS = ('full', 'no_refinement', 'fewer_particles', 'skip_detection')
+
+
+class LatestFrameReader:
+    """
+    Reads a camera or stream on its own thread, keeping only the most recent frame.
+    :param source: Anything cv2.VideoCapture opens, a device index for a webcam
+    """
+
+    def __init__(self, source=0):
+        self.video = cv2.VideoCapture(source)
+        self.condition = threading.Condition()
+        self.frame = None
+        self.captured = 0.
+        self.frame_no = -1
+        self.last_read = -1
+        self.dropped = 0
+        self.stopped = False
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped:
+            ok, frame = self.video.read()
+            with self.condition:
+                if not ok:
+                    self.stopped = True
+                else:
+                    # A frame nobody read is stale by now
+                    if self.frame_no > self.last_read:
+                        self.dropped += 1
+                    self.frame, self.captured = frame, time.perf_counter()
+                    self.frame_no += 1
+                self.condition.notify_all()
+
+    def read(self):
+        """
+        Wait for a frame newer than the last one read.
+        :return: Whether a frame was read, the frame and the time it was captured
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame_no > self.last_read or self.stopped)
+            if self.frame_no <= self.last_read:
+                return False, None, None
+
+            self.last_read = self.frame_no
+            return True, self.frame, self.captured
+
+    def release(self):
+        self.stopped = True
+        self.thread.join()
+        self.video.release()
+
+
+class LiveTracker:
+    """
+    :param tracker: Tracker whose homography and filters are run on the live frames, built with
+    video=None since the frames come from the reader, and with the initial_H of the camera
+    :param detect: Function from a frame to its (N, 4) player boxes
+    :param reader: LatestFrameReader the frames come from
+    :param budget_ms: Largest delay from capture to overlay, in milliseconds
+    """
+
+    def __init__(self, tracker, detect, reader, budget_ms=40.):
+        self.tracker = tracker
+        self.detect = detect
+        self.reader = reader
+        self.budget = budget_ms / 1000
+
+        self.level = 0
+        self.calm = 0
+        self.frames = 0
+        self.latencies = []
+        self.level_frames = np.zeros(len(LEVELS), dtype=int)
+        self.particle_budget = getattr(tracker.filters, 'budget', None)
+
+    def _set_level(self, level):
+        self.level = level
+        self.calm = 0
+
+        # Refinement is skipped on some levels, so the features last tracked may be frames old
+        self.tracker.homography.reset_flow()
+
+        if self.particle_budget is not None:
+            # Half the particles from the fewer_particles level on, the bank resamples down at once
+            self.tracker.filters.set_budget(self.particle_budget // 2 if level >= 2 else self.particle_budget)
+
+    def _adapt(self, latency):
+        if latency > self.budget and self.level < len(LEVELS) - 1:
+            self._set_level(self.level + 1)
+        elif latency < 0.6 * self.budget and self.level > 0:
+            # Only step back up after a run of comfortable frames
+            self.calm += 1
+            if self.calm >= 30:
+                self._set_level(self.level - 1)
+        else:
+            self.calm = 0
+
+    def step(self, add_players=False, add_particle_filters=True):
+        """
+        Track the newest frame.
+        :return: The frame with its overlays, None once the stream ends
+        """
+        ok, frame, captured = self.reader.read()
+        if not ok:
+            return
+
+        changed_scene = self.tracker.scene_change.update(frame)
+        keyframe = self.level < 3 or self.frames % 2 == 0 or changed_scene
+        detections = self.detect(frame) if keyframe else np.empty((0, 4), np.float32)
+
+        frame = self.tracker.process_frame(frame, changed_scene, detections, keyframe, add_players,
+                                           add_particle_filters, refine_homography=self.level < 1)
+
+        latency = time.perf_counter() - captured
+        self.latencies.append(latency)
+        self.level_frames[self.level] += 1
+        self.frames += 1
+        self._adapt(latency)
+        return frame
+
+    def run(self, show=True):
+        while True:
+            frame = self.step()
+            if frame is None:
+                break
+
+            if show:
+                cv2.imshow('live', frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
+
+        self.reader.release()
+        if show:
+            cv2.destroyAllWindows()
+        return self.report()
+
+    def report(self):
+        """
+        :return: Median and 99th percentile delay from capture to overlay, in milliseconds
+        """
+        if not self.latencies:
+            return 0., 0.
+
+        p50, p99 = 1000 * np.percentile(self.latencies, [50, 99])
+        print("Latency: p50 %.1f ms, p99 %.1f ms, budget %.1f ms" % (p50, p99, 1000 * self.budget))
+        print("Frames: %d tracked, %d dropped" % (self.frames, self.reader.dropped))
+        for name, count in zip(LEVELS, self.level_frames):
+            print("  %-16s %5.1f%% of frames" % (name, 100 * count / self.frames))
+        return p50, p99
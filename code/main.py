@@ -1,14 +1,25 @@
 import tkinter as tk
 import os.path
-from threading import Timer
+import sys
+import threading
+from collections import deque
 
+import cv2
 import h5py
 import numpy as np
 from PIL import Image, ImageTk
 
+from code.tracker import Tracker
+
+# Rate the Tk thread shows frames at, whatever rate they are produced at
+DISPLAY_FPS = 25
+
+# Composited frames waiting to be shown, older ones are dropped once it is full
+RING_SIZE = 4
+
 class App(tk.Frame):
 
-    def __init__(self, master, player_detection_in, line_annotation_in, video):
+    def __init__(self, master, player_detection_in, line_annotation_in, video, initial_H=None):
         tk.Frame.__init__(self, master)
         self.master.title("Rugby Tracking")
         self.master.resizable(False, False)
@@ -66,6 +77,22 @@ class App(tk.Frame):
 
         np.set_printoptions(precision=4)
 
+        # Processing runs on a worker thread, the Tk thread only shows its newest frame
+        self.tracker = Tracker(video, player_detection_in, line_annotation_in, initial_H=initial_H)
+        self.pitch_base = self.draw_pitch()
+        self.ring = deque(maxlen=RING_SIZE)
+        self.ring_lock = threading.Lock()
+        self.playing = threading.Event()
+        self.stopped = threading.Event()
+        self.frame_no = 0
+        self.dropped = 0
+
+        self.worker = threading.Thread(target=self.process_frames, daemon=True)
+        self.worker.start()
+
+        self.master.protocol('WM_DELETE_WINDOW', self.close)
+        self.master.after(1000 // DISPLAY_FPS, self.update_frames)
+
     def toggle_part_filter(self):
         self.filters = not self.filters
         self.filter_btn.configure(text='Hide Particle Filter' if self.filters else 'Show Particle Filter')
@@ -85,13 +112,114 @@ class App(tk.Frame):
     def toggle_play(self):
         self.should_play = not self.should_play
         self.play_btn.configure(text=' || Pause ' if self.should_play else ' > Play ')
-        #self.master.after(1, self.update_frames)
+
+        if self.should_play:
+            self.playing.set()
+        else:
+            self.playing.clear()
 
     def hide_change_lbl(self):
         self.changedLabel.grid_remove()
 
+    def draw_pitch(self):
+        pitch = np.zeros((350, 600, 3), np.uint8)
+        pitch[:] = (40, 120, 40)
+
+        for _, a, b, c in self.tracker.pitch.equations.astype(int):
+            if a:
+                cv2.line(pitch, (-c, 0), (-c, 349), (255, 255, 255), 1)
+            else:
+                cv2.line(pitch, (0, -c), (599, -c), (255, 255, 255), 1)
+
+        return pitch
+
+    def composite_pitch(self):
+        pitch = self.pitch_base.copy()
+
+        if self.filters and self.tracker.H is not None:
+            self.tracker.filters.draw(pitch)
+
+        return pitch
+
+    def process_frames(self):
+        """
+        Worker thread: track frames while playing and queue them, composited and converted to RGB,
+        for the Tk thread. Never touches Tk itself.
+        """
+        while not self.stopped.is_set():
+            if not self.playing.wait(0.1):
+                continue
+
+            frame, changed_scene = self.tracker.get_frame(self.lines, self.footage_detections, self.homographies, self.filters)
+            if frame is None:
+                self.playing.clear()
+                continue
+
+            item = (cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), cv2.cvtColor(self.composite_pitch(), cv2.COLOR_BGR2RGB),
+                    changed_scene, self.tracker.H, len(self.tracker.filters), self.tracker.counter)
+
+            with self.ring_lock:
+                if len(self.ring) == self.ring.maxlen:
+                    self.dropped += 1
+                self.ring.append(item)
+
+    def update_frames(self):
+        """
+        Tk thread: show the newest composited frame, at display rate.
+        """
+        with self.ring_lock:
+            item = self.ring.pop() if self.ring else None
+            # Everything older than the newest frame is never shown
+            self.dropped += len(self.ring)
+            self.ring.clear()
+
+        if item is not None:
+            footage, pitch, changed_scene, H, n_filters, self.frame_no = item
+
+            self.footage_img_tk = ImageTk.PhotoImage(Image.fromarray(footage))
+            self.footage_lbl.configure(image=self.footage_img_tk)
+            self.pitch_img_tk = ImageTk.PhotoImage(Image.fromarray(pitch))
+            self.pitch_lbl.configure(image=self.pitch_img_tk)
+
+            self.homog_text.configure(text=str(H) if H is not None else '')
+            self.players_and_frames.configure(text='Number of active filters: %d\nFrame: %d\nDropped frames: %d' % (n_filters, self.frame_no, self.dropped))
+
+            if changed_scene:
+                self.changedLabel.grid(column=0, row=0)
+                self.master.after(1000, self.hide_change_lbl)
+
+        if not self.stopped.is_set():
+            self.master.after(1000 // DISPLAY_FPS, self.update_frames)
+
+    def close(self):
+        # The worker may be part way through a frame, wait for it without blocking the Tk thread
+        self.stopped.set()
+        self.finish_close()
+
+    def finish_close(self):
+        if self.worker.is_alive():
+            self.master.after(50, self.finish_close)
+            return
+
+        self.tracker.release()
+        self.master.destroy()
+
 
 if __name__ == '__main__':
     root = tk.Tk()
 
     dirname = os.path.dirname(__file__)
+
+    # Video, detection store and line annotations, next to this file unless given
+    video = sys.argv[1] if len(sys.argv) > 1 else os.path.join(dirname, 'wales_vs_ireland_edit.mp4')
+    detections = sys.argv[2] if len(sys.argv) > 2 else os.path.join(dirname, 'detections.h5')
+    lines = sys.argv[3] if len(sys.argv) > 3 else os.path.join(dirname, 'lines.h5')
+
+    # The first homography comes from the annotated lines, or from a saved 3x3 .npy in their place
+    initial_H = None
+    if lines.endswith('.npy'):
+        lines, initial_H = None, np.load(lines)
+
+    app = App(root, detections, lines, video, initial_H)
+    app.pack()
+    root.mainloop()
@@ -1,12 +1,18 @@
 import numpy as np
-import scipy.stats
-from numpy.random import randn, random
+from numpy.random import randn
 import cv2
 
+from code.filter_bank import FilterBank
+from code.likelihood import GaussianLikelihood
+from code.resampling import get_resampler
+from code.kld_sampling import occupied_bins, kld_sample_size
+
 class ParticleFilter:
 
-    def __init__(self, N, pos, p_std=(0.005, 0.005), v_std=(5, 5)):
+    def __init__(self, N, pos, p_std=(0.005, 0.005), v_std=(5, 5), likelihood=None, resampler='multinomial'):
         self.N = N
+        self.likelihood = likelihood if likelihood is not None else GaussianLikelihood()
+        self.resampler = get_resampler(resampler)
 
         # Store x, y
         self.particles = np.empty((N, 2))
@@ -21,18 +27,16 @@ class ParticleFilter:
         self.bayes_draw = False
         self.weights = np.ones(self.N)
 
+        # Resampling writes into these and swaps them with the live arrays, nothing is allocated
+        self._indexes = np.empty(N, dtype=int)
+        self._scratch = np.empty((N, 2))
+
     def predict(self):
         self.particles += self.velocities
 
     def update(self, z):
         self.bayes_draw = False
-        self.weights = np.ones(self.N)
-
-        dists = np.linalg.norm(self.particles - z, axis=1)
-        self.weights *= scipy.stats.norm(dists).pdf(0)
-
-        self.weights += 1e-300
-        self.weights /= sum(self.weights)
+        self.likelihood(self.particles, z, out=self.weights)
         self.delta_time = 0
 
     def update_none(self):
@@ -43,10 +47,9 @@ class ParticleFilter:
 
     def resample(self):
         if 1 / np.sum(np.square(self.weights)) < self.N / 1.5:
-            c_sum = np.cumsum(self.weights)
-            c_sum[-1] = 1
-            indexes = np.searchsorted(c_sum, random(self.N))
-            self.particles[:] = self.particles[indexes]
+            self.resampler(self.weights, out=self._indexes)
+            np.take(self.particles, self._indexes, axis=0, out=self._scratch)
+            self.particles, self._scratch = self._scratch, self.particles
             self.weights.fill(1/self.N)
 
     def estimate(self):
@@ -57,3 +60,151 @@ class ParticleFilter:
         cv2.circle(image, (x, y), 3, (0, 0, 255) if self.bayes_draw else (255, 0, 0), -1)
         return image
 
+
+
+class ParticleFilterBank(FilterBank):
+    """
+    The particle filters of every tracked player held in single arrays, particles (P, N, 2),
+    velocities (P, N, 2) and weights (P, N), so each step runs once for all tracks.
+
+    With adaptive set each track only uses its first counts[i] of the N particles, chosen by
+    KLD-sampling at every resample so tight posteriors shrink and spread ones grow. Tracks
+    coasting without measurements grow too. Every step only runs over the first counts.max()
+    columns, so budget caps each track at budget // P particles: the work per frame, P times
+    the widest track, then never exceeds the budget.
+    """
+
+    STATE = ('particles', 'velocities', 'weights', 'counts')
+
+    def __init__(self, N=500, capacity=32, p_std=(0.005, 0.005), v_std=(5, 5), likelihood=None, resampler='multinomial',
+                 adaptive=False, min_particles=50, budget=None, kld_epsilon=0.05, kld_delta=0.01, bin_size=2.):
+        FilterBank.__init__(self, capacity)
+        self.N = N
+        self.likelihood = likelihood if likelihood is not None else GaussianLikelihood()
+        self.resampler = get_resampler(resampler)
+        self.p_std = np.asarray(p_std, dtype=float)
+        self.v_std = np.asarray(v_std, dtype=float)
+
+        self.adaptive = adaptive
+        self.min_particles = min_particles
+        self.budget = budget
+        self.kld_epsilon = kld_epsilon
+        self.kld_delta = kld_delta
+        self.bin_size = bin_size
+
+        self.particles = np.empty((capacity, N, 2))
+        self.velocities = np.empty((capacity, N, 2))
+        self.weights = np.empty((capacity, N))
+        self.counts = np.full(capacity, N)
+
+    def _start(self, new, positions):
+        k = len(positions)
+        self.particles[new] = positions[:, np.newaxis] + randn(k, self.N, 2) * self.p_std
+        self.velocities[new] = randn(k, self.N, 2) * self.v_std
+
+        self.counts[new] = self.N
+        if self.adaptive and self.budget is not None:
+            # Existing tracks give up particles to make room within the budget
+            ceiling = self._ceiling(self.P + k)
+            self._shrink(ceiling)
+            self.counts[new] = min(self.N, ceiling)
+        self.weights[new] = self._active(new, self.N) / self.counts[new, np.newaxis]
+
+    def particle_count(self):
+        return int(self.counts[:self.P].sum())
+
+    def _width(self):
+        # Particles past the largest count are never looked at
+        return int(self.counts[:self.P].max()) if self.P else 0
+
+    def _active(self, slots, width):
+        return np.arange(width) < self.counts[slots, np.newaxis]
+
+    def _ceiling(self, P):
+        return max(self.budget // max(P, 1), 1)
+
+    def _fit_budget(self, slots, desired):
+        if self.budget is None:
+            return desired
+
+        # The budget wins over min_particles when there are too many tracks for both
+        return np.minimum(desired, self._ceiling(self.P))
+
+    def _shrink(self, ceiling):
+        over = np.flatnonzero(self.counts[:self.P] > ceiling)
+        if len(over):
+            self._draw(over, np.full(len(over), ceiling))
+
+    def set_budget(self, budget):
+        """
+        Change the budget, tracks over their new share are resampled down straight away.
+        """
+        self.budget = budget
+        if self.adaptive and budget is not None:
+            self._shrink(self._ceiling(self.P))
+
+    def _draw(self, slots, counts):
+        """
+        Replace the particles of the given tracks with counts[i] draws from their weights.
+        """
+        width = max(self._width(), int(np.max(counts)))
+        indexes = self.resampler(self.weights[slots, :width], counts=counts)
+        self.particles[slots, :width] = np.take_along_axis(self.particles[slots, :width], indexes[..., np.newaxis], axis=1)
+
+        self.counts[slots] = counts
+        self.weights[slots, :width] = self._active(slots, width) / self.counts[slots, np.newaxis]
+
+    def predict(self):
+        width = self._width()
+        self.particles[:self.P, :width] += self.velocities[:self.P, :width]
+
+    def update(self, slots, z):
+        """
+        :param slots: Slots of the tracks that received a measurement
+        :param z: (len(slots), 2) measured positions
+        """
+        width = self._width()
+        weights = self.likelihood(self.particles[slots, :width], z)
+        if self.adaptive:
+            weights *= self._active(slots, width)
+            weights /= weights.sum(axis=1, keepdims=True)
+
+        self.weights[slots, :width] = weights
+        self._measured(slots)
+
+    def update_none(self, slots):
+        lost = FilterBank.update_none(self, slots)
+
+        # Coasting tracks get more particles as their uncertainty grows
+        if self.adaptive:
+            slots = np.asarray(slots)
+            growing = slots[self.counts[slots] < self.N]
+            if len(growing):
+                self._draw(growing, self._fit_budget(growing, np.minimum(self.N, self.counts[growing] * 5 // 4 + 1)))
+
+        return lost
+
+    def resample(self, slots=None):
+        slots = np.arange(self.P) if slots is None else np.asarray(slots)
+        width = self._width()
+        weights = self.weights[slots, :width]
+
+        slots = slots[1 / np.sum(np.square(weights), axis=1) < self.counts[slots] / 1.5]
+        if len(slots) == 0:
+            return
+
+        if not self.adaptive:
+            self._draw(slots, self.counts[slots])
+            return
+
+        # Size each posterior by the bins holding particles with a meaningful share of the weight
+        weights = self.weights[slots, :width]
+        bins = occupied_bins(self.particles[slots, :width], weights * self.counts[slots, np.newaxis] > 0.1, self.bin_size)
+        desired = np.clip(kld_sample_size(bins, self.kld_epsilon, self.kld_delta), self.min_particles, self.N)
+
+        self._draw(slots, self._fit_budget(slots, desired))
+
+    def estimate(self):
+        width = self._width()
+        weights = self.weights[:self.P, :width, np.newaxis]
+        return np.sum(self.particles[:self.P, :width] * weights, axis=1) / np.sum(weights, axis=1)
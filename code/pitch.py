@@ -0,0 +1,100 @@
+import enum
+
+import numpy as np
+
+
+class Lines(enum.Enum):
+    LEFT_TRY = 0
+    LEFT_5M = 1
+    LEFT_22M = 2
+    LEFT_10M = 3
+    HALFWAY = 4
+    RIGHT_10M = 5
+    RIGHT_22M = 6
+    RIGHT_5M = 7
+    RIGHT_TRY = 8
+    TOP_TOUCH = 9
+    TOP_5M = 10
+    TOP_15M = 11
+    BOTTOM_15M = 12
+    BOTTOM_5M = 13
+    BOTTOM_TOUCH = 14
+
+
+# Positions of the lines of the default pitch image, try line to try line then touch line to touch line
+DEFAULT_VERTICALS = (83, 104, 178, 257, 300, 343, 421, 495, 517)
+DEFAULT_HORIZONTALS = (14, 34, 78, 252, 295, 317)
+
+
+class PitchModel:
+    """
+    Fixed geometry of the pitch markings in pitch image coordinates. Every line equation and the
+    intersection of every pair of lines are worked out once, so labelled footage intersections are
+    matched to the pitch with a single lookup.
+    :param verticals: x of the nine lines across the pitch, in Lines order
+    :param horizontals: y of the six lines along the pitch, in Lines order
+    """
+
+    def __init__(self, verticals=DEFAULT_VERTICALS, horizontals=DEFAULT_HORIZONTALS):
+        verticals = np.asarray(verticals, dtype=float)
+        horizontals = np.asarray(horizontals, dtype=float)
+        n = len(verticals) + len(horizontals)
+
+        # Rows of t, a, b, c with the line ax + by + c = 0
+        self.equations = np.zeros((n, 4))
+        self.equations[:, 0] = np.arange(n)
+        self.equations[:len(verticals), 1] = 1
+        self.equations[len(verticals):, 2] = 1
+        self.equations[:, 3] = -np.concatenate((verticals, horizontals))
+
+        # Intersection of lines t1 and t2 at [t1, t2], nan for parallel lines
+        a, b, c = self.equations[:, 1:].T
+        det = a[:, np.newaxis] * b - a * b[:, np.newaxis]
+        parallel = det == 0
+        det[parallel] = 1
+
+        self.intersections = np.stack(((b[:, np.newaxis] * c - b * c[:, np.newaxis]) / det,
+                                       (a * c[:, np.newaxis] - a[:, np.newaxis] * c) / det), axis=-1)
+        self.intersections[parallel] = np.nan
+
+        self.size = int(verticals.max() + verticals.min()), int(horizontals.max() + horizontals.min())
+
+    @classmethod
+    def from_dimensions(cls, length=100., width=70., scale=4.34, margin=(83, 14)):
+        """
+        Pitch model for a ground of the given size, in metres between the try lines and between
+        the touch lines.
+        :param scale: Pitch image units per metre
+        :param margin: Position of the left try line and top touch line in the pitch image
+        """
+        half = length / 2
+        verticals = np.array([0, 5, 22, half - 10, half, half + 10, length - 22, length - 5, length])
+        horizontals = np.array([0, 5, 15, width - 15, width - 5, width])
+
+        return cls(margin[0] + scale * verticals, margin[1] + scale * horizontals)
+
+    def equation(self, line):
+        """
+        :return: The t, a, b, c equation of the line, None if an invalid line
+        """
+        # Labels come out of the float equation arrays, 1.0 names the same line as 1
+        if line is None or line != int(line):
+            return
+        line = int(line)
+
+        if 0 <= line < len(self.equations):
+            return tuple(self.equations[line].tolist())
+
+    def point_pairs(self, footage_points):
+        """
+        :param footage_points: (K, 4) labelled footage intersections of t1, t2, x, y
+        :return: (M, 4) rows of footage x, y and pitch x, y for the intersections that exist on the pitch
+        """
+        footage_points = np.asarray(footage_points, dtype=float).reshape(-1, 4)
+        labels = footage_points[:, :2].astype(int)
+
+        valid = ((labels >= 0) & (labels < len(self.equations))).all(axis=1)
+        pitch_points = self.intersections[labels[valid, 0], labels[valid, 1]]
+        found = ~np.isnan(pitch_points[:, 0])
+
+        return np.column_stack((footage_points[valid][found, 2:], pitch_points[found]))
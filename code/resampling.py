@@ -0,0 +1,103 @@
+"""
+Resampling schemes for particle filters. Each takes weights of shape (N,) or (P, N), normalised
+along the last axis, and returns the indexes of the particles to keep in the same shape, so a bank
+of filters is resampled in one call. Passing out writes the indexes into a preallocated int array.
+counts gives the number of particles to draw for each row when filters adapt their sample size,
+only the first counts[i] indexes of row i are then meaningful.
+"""
+import numpy as np
+from numpy.random import random
+
+
+def _search(weights, positions):
+    """
+    Index of the particle each position in [0, 1) falls on, row by row. Rows are offset by their
+    index so a single searchsorted over the flattened cumulative sums covers all of them.
+    """
+    rows, N = weights.shape
+
+    c_sum = np.cumsum(weights, axis=1)
+    c_sum[:, -1] = 1
+    offsets = np.arange(rows)[:, np.newaxis]
+    c_sum += offsets
+
+    # Positions past the end (rows drawing fewer than N particles) are pinned inside their own row
+    positions = np.minimum(positions, np.nextafter(1, 0))
+    indexes = np.searchsorted(c_sum.ravel(), (positions + offsets).ravel(), side='right')
+    indexes = indexes.reshape(rows, N) - offsets * N
+
+    # Guard against rounding pushing an index past the end of its row
+    return np.minimum(indexes, N - 1, out=indexes)
+
+
+def _counts(rows, N, counts):
+    if counts is None:
+        return np.full((rows, 1), N, dtype=float)
+    return np.asarray(counts, dtype=float).reshape(rows, 1)
+
+
+def _resample(weights, out, counts, positions):
+    weights = np.asarray(weights)
+    rows = weights.reshape(-1, weights.shape[-1])
+    n = _counts(*rows.shape, counts)
+
+    indexes = _search(rows, positions(rows.shape[0], rows.shape[1], n)).reshape(weights.shape)
+    if out is None:
+        return indexes
+
+    out[...] = indexes
+    return out
+
+
+def multinomial(weights, out=None, counts=None):
+    return _resample(weights, out, counts, lambda rows, N, n: random((rows, N)))
+
+
+def systematic(weights, out=None, counts=None):
+    return _resample(weights, out, counts, lambda rows, N, n: (random((rows, 1)) + np.arange(N)) / n)
+
+
+def stratified(weights, out=None, counts=None):
+    return _resample(weights, out, counts, lambda rows, N, n: (random((rows, N)) + np.arange(N)) / n)
+
+
+def residual(weights, out=None, counts=None):
+    weights = np.asarray(weights)
+    rows, N = weights.reshape(-1, weights.shape[-1]).shape
+    scaled = _counts(rows, N, counts) * weights.reshape(rows, N)
+
+    # Every particle is kept floor(n * w) times, the remainder is drawn from what is left over
+    copies = np.floor(scaled).astype(int)
+    kept = copies.sum(axis=1)
+
+    leftover = scaled - copies
+    totals = leftover.sum(axis=1, keepdims=True)
+    np.divide(leftover, totals, out=leftover, where=totals > 0)
+
+    indexes = _search(leftover, random((rows, N)))
+    deterministic = np.arange(N)[np.newaxis, :] < kept[:, np.newaxis]
+    indexes[deterministic] = np.repeat(np.tile(np.arange(N), rows), copies.ravel())
+
+    indexes = indexes.reshape(weights.shape)
+    if out is None:
+        return indexes
+
+    out[...] = indexes
+    return out
+
+
+RESAMPLERS = {
+    'multinomial': multinomial,
+    'systematic': systematic,
+    'stratified': stratified,
+    'residual': residual,
+}
+
+
+def get_resampler(resampler):
+    """
+    :param resampler: Name of a scheme in RESAMPLERS or a function with the same signature
+    """
+    if callable(resampler):
+        return resampler
+    return RESAMPLERS[resampler]
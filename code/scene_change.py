@@ -0,0 +1,117 @@
+"""
+Scene cut detection as a cascade of increasingly expensive tests, all run on a small thumbnail of
+the frame. A grey level histogram difference settles most frames, a block mean hash looks at the
+ones it is unsure about and PHash only confirms the remaining candidates. tier caps how far the
+cascade may go: stopping early is cheaper but lets more camera pans through as cuts.
+"""
+import time
+
+import cv2
+import numpy as np
+
+TIERS = ('histogram', 'block_mean', 'phash')
+
+
+class SceneChangeDetector:
+    """
+    :param tier: Most expensive test allowed, one of TIERS
+    :param thumb_size: Width and height of the thumbnail every test runs on
+    :param hist_low: Histogram distance below which the frame is never a cut
+    :param hist_high: Histogram distance above which the frame is a cut, whatever the tier
+    :param block_low: Block mean hash bits that may change without the frame being a cut
+    :param block_high: Block mean hash bits that must change for a cut, block_mean tier only
+    :param phash_thresh: PHash Hamming distance above which a cut is confirmed
+    """
+
+    def __init__(self, tier='phash', thumb_size=(64, 36), hist_low=0.15, hist_high=0.4, block_low=40, block_high=80, phash_thresh=10):
+        if tier not in TIERS:
+            raise ValueError("tier must be one of %s" % (TIERS,))
+
+        self.tier = TIERS.index(tier)
+        self.thumb_size = thumb_size
+        self.hist_low, self.hist_high = hist_low, hist_high
+        self.block_low, self.block_high = block_low, block_high
+        self.phash_thresh = phash_thresh
+        self.PHash = cv2.img_hash_PHash().create() if self.tier == 2 else None
+
+        self.prev = None
+        self.prev_hist = None
+        self.block = self.prev_block = None
+        self.phash = self.prev_phash = None
+
+        self.frames = 0
+        self.cuts = 0
+        self.elapsed = 0.
+        self.reached = np.zeros(len(TIERS), dtype=int)
+
+    def reset(self):
+        """
+        Forget the previous frame, the next one is never reported as a cut.
+        """
+        self.prev = self.prev_hist = self.prev_block = self.prev_phash = None
+
+    def _block_mean(self, thumb):
+        # 16x16 block means, one bit per block above the median
+        blocks = cv2.resize(thumb, (16, 16), interpolation=cv2.INTER_AREA)
+        return (blocks > np.median(blocks)).ravel()
+
+    def _hashes(self, name, thumb, compute):
+        # Hashes are only worked out for frames that reach their tier, the previous frame's is
+        # reused when it got that far too
+        prev = getattr(self, 'prev_' + name)
+        if prev is None:
+            prev = compute(self.prev)
+
+        current = compute(thumb)
+        setattr(self, name, current)
+        return prev, current
+
+    def _is_cut(self, thumb, hist):
+        d = 0.5 * np.abs(hist - self.prev_hist).sum()
+        self.reached[0] += 1
+        if d < self.hist_low:
+            return False
+        # A change this large is a cut, the hashes only settle the ambiguous cases in between
+        if d >= self.hist_high:
+            return True
+        if self.tier == 0:
+            return False
+
+        self.reached[1] += 1
+        prev, block = self._hashes('block', thumb, self._block_mean)
+        bits = np.count_nonzero(prev != block)
+        if self.tier == 1:
+            return bits >= self.block_high
+        if bits <= self.block_low:
+            return False
+
+        self.reached[2] += 1
+        prev, phash = self._hashes('phash', thumb, self.PHash.compute)
+        return self.PHash.compare(prev, phash) > self.phash_thresh
+
+    def update(self, frame):
+        """
+        :return: True if frame starts a new scene
+        """
+        start = time.perf_counter()
+
+        # Every fourth pixel is plenty to average down to a thumbnail and halves the cost
+        thumb = cv2.resize(frame[::4, ::4], self.thumb_size, interpolation=cv2.INTER_AREA)
+        if thumb.ndim == 3:
+            thumb = cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY)
+        hist = np.bincount(thumb.ravel() >> 3, minlength=32) / thumb.size
+
+        self.block = self.phash = None
+        cut = self.prev is not None and self._is_cut(thumb, hist)
+        self.prev, self.prev_hist, self.prev_block, self.prev_phash = thumb, hist, self.block, self.phash
+
+        self.frames += 1
+        self.cuts += cut
+        self.elapsed += time.perf_counter() - start
+        return cut
+
+    def report(self):
+        frames = max(self.frames, 1)
+        print("Scene change: %.3f ms/frame over %d frames, %d cuts" % (1000 * self.elapsed / frames, self.frames, self.cuts))
+        for name, reached in zip(TIERS[:self.tier + 1], self.reached):
+            print("  %-10s ran on %5.1f%% of frames" % (name, 100 * reached / frames))
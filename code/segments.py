@@ -0,0 +1,196 @@
+"""
+Whole match processing spread over processes. Every scene cut clears the tracks, so the segments
+between cuts are independent: a quick pass finds the cuts, then the detector and the tracker run
+on each segment in a worker of their own and the per-frame results are stitched back together in
+frame order.
+
+The homography is the exception. The first estimate of a scene labels its lines against the last
+homography of the scene before, so it is followed through the whole match in order on one process
+and handed to the workers, whose tracks then match those of a single Tracker run.
+"""
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from code.scene_change import SceneChangeDetector
+from code.tracker import Tracker
+
+# The YOLO stage is a directory of scripts that import each other by name
+YOLO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'YOLOv3Prototype')
+
+
+def _scan(args):
+    """
+    Cuts within frames [start, end), reading from the frame before start so the first one has a
+    predecessor to be compared to.
+    """
+    video, start, end, tier = args
+    cap = cv2.VideoCapture(video)
+    detector = SceneChangeDetector(tier)
+    cuts = []
+
+    first = max(start - 1, 0)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    for frame_no in range(first, end):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if detector.update(frame) and frame_no >= start:
+            cuts.append(frame_no)
+
+    cap.release()
+    return cuts
+
+
+def find_cuts(video, workers=None, tier='block_mean'):
+    """
+    :param tier: Scene change tier of the quick pass, see SceneChangeDetector
+    :return: Frame numbers that start a new scene and the number of frames in the video
+    """
+    workers = workers or os.cpu_count()
+    cap = cv2.VideoCapture(video)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    bounds = np.linspace(0, n_frames, workers + 1).astype(int)
+    jobs = [(video, start, end, tier) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+    with ProcessPoolExecutor(workers) as pool:
+        cuts = [cut for chunk in pool.map(_scan, jobs) for cut in chunk]
+    return cuts, n_frames
+
+
+def split_segments(cuts, n_frames, min_length=1):
+    """
+    :param min_length: Segments shorter than this are merged into the one before, the first
+    segment is kept whatever its length
+    :return: (start, end) frame ranges between the cuts
+    """
+    bounds = sorted(set(cut for cut in cuts if 0 < cut < n_frames)) + [n_frames]
+    starts = [0]
+
+    # A cut only starts a segment when the segment it starts is long enough
+    for cut, next_cut in zip(bounds[:-1], bounds[1:]):
+        if next_cut - cut >= min_length:
+            starts.append(cut)
+
+    return list(zip(starts, starts[1:] + [n_frames]))
+
+
+def _import_yolo():
+    # Appended rather than prepended so its script names shadow nothing already importable
+    if YOLO_DIR not in sys.path:
+        sys.path.append(YOLO_DIR)
+
+
+def detect_segment(args):
+    """
+    Run the detector over frames [start, end) into a detection store of their own.
+    :return: Filename of the store
+    """
+    video, store, start, end, model_file, detect_kwargs = args
+    _import_yolo()
+    import predict
+
+    predict.process_video(video, predict.load_model(model_file), show=False, output=None, detections=store,
+                          max_frames=end - start, start_frame=start, **detect_kwargs)
+    return store
+
+
+def follow_camera(video, cuts, n_frames, tracker_kwargs):
+    """
+    Homography of every frame in order, each scene starting from the last one of the scene before.
+    :return: List of n_frames homographies, None where it was unknown or the frame could not be read
+    """
+    tracker = Tracker(video, None, **dict(tracker_kwargs, read_ahead=False))
+    cuts = set(cuts)
+    Hs = [None] * n_frames
+
+    for frame_no in range(n_frames):
+        ok, frame = tracker.video.read()
+        if not ok:
+            break
+        Hs[frame_no] = tracker.update_homography(frame, frame_no in cuts, H=tracker.annotated_homography(frame_no))
+
+    tracker.release()
+    return Hs
+
+
+def track_segment(args):
+    """
+    Run the filters over the detections of frames [start, end), placed on the pitch through the
+    homographies found by follow_camera.
+    :return: Frame number, track ids and pitch positions of every frame, and the number of track ids used
+    """
+    detections, start, end, cuts, Hs, tracker_kwargs = args
+    tracker = Tracker(None, detections, **tracker_kwargs)
+    frames = []
+
+    for frame_no, H in zip(range(start, end), Hs):
+        tracker.H = H
+        tracker.track_players(frame_no in cuts, tracker.detections[frame_no], tracker.detections.is_keyframe(frame_no))
+
+        n = len(tracker.filters)
+        frames.append((frame_no, tracker.filters.ids[:n].copy(), tracker.filters.estimate()))
+
+    tracker.release()
+    return frames, tracker.filters.next_id
+
+
+def process_match(video, detections, workers=None, cut_tier='block_mean', min_length=25, model_file=None, detect_kwargs=None, **tracker_kwargs):
+    """
+    Detect and track a whole match on every core.
+    :param detections: HDF5 detection store of the video. With model_file it is written here from
+    the detections of every segment, otherwise it must already have been written by the YOLO stage
+    :param min_length: Shortest segment worth a worker, shorter ones join the segment before
+    :param model_file: YOLOv3 model to detect the players with, None to use the existing store
+    :param detect_kwargs: Passed on to each segment's process_video, e.g. keyframe_interval
+    :param tracker_kwargs: Passed on to each Tracker, line_annotations or initial_H are needed to
+    start the homography from
+    :return: For every frame of the video, the ids of the tracks, their (P, 2) pitch positions
+    and the homography, None where it was unknown. Ids are unique across segments.
+    """
+    workers = workers or os.cpu_count()
+    cuts, n_frames = find_cuts(video, workers, cut_tier)
+    segments = split_segments(cuts, n_frames, min_length)
+
+    # Longest segments first so a long one started last does not hold up the end of the run
+    order = sorted(range(len(segments)), key=lambda i: segments[i][0] - segments[i][1])
+    results = [None] * len(segments)
+
+    with ProcessPoolExecutor(workers) as pool:
+        if model_file is not None:
+            parts = ['%s.%d' % (detections, i) for i in range(len(segments))]
+            detecting = [pool.submit(detect_segment, (video, parts[i], *segments[i], model_file, detect_kwargs or {}))
+                         for i in order]
+
+        # The camera is followed on this process while the workers run the detector
+        Hs = follow_camera(video, cuts, n_frames, tracker_kwargs)
+
+        if model_file is not None:
+            _import_yolo()
+            from detection_store import merge_stores
+
+            merge_stores([future.result() for future in detecting], detections, video, n_frames)
+            for part in parts:
+                os.remove(part)
+
+        # Cuts too close together to be worth a segment each still clear the tracks within a segment
+        jobs = [(detections, start, end, [cut for cut in cuts if start <= cut < end], Hs[start:end], tracker_kwargs)
+                for start, end in segments]
+        futures = {i: pool.submit(track_segment, jobs[i]) for i in order}
+        for i, future in futures.items():
+            results[i] = future.result()
+
+    # Placed by frame number, every frame keeps its homography even where no tracks were returned
+    out = [(np.empty(0, dtype=int), np.empty((0, 2), np.float32), H) for H in Hs]
+    id_offset = 0
+    for frames, n_ids in results:
+        for frame_no, ids, positions in frames:
+            out[frame_no] = (ids + id_offset, positions, Hs[frame_no])
+        id_offset += n_ids
+
+    return out
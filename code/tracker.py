@@ -1,44 +1,120 @@
 import cv2
 import numpy as np
-from scipy.optimize import linear_sum_assignment
 import os.path
-import enum
-
-from code.particle_filter import ParticleFilter
-
-class Lines(enum.Enum):
-    LEFT_TRY = 0
-    LEFT_5M = 1
-    LEFT_22M = 2
-    LEFT_10M = 3
-    HALFWAY = 4
-    RIGHT_10M = 5
-    RIGHT_22M = 6
-    RIGHT_5M = 7
-    RIGHT_TRY = 8
-    TOP_TOUCH = 9
-    TOP_5M = 10
-    TOP_15M = 11
-    BOTTOM_15M = 12
-    BOTTOM_5M = 13
-    BOTTOM_TOUCH = 14
+import time
 
-class Tracker:
+from code.particle_filter import ParticleFilterBank
+from code.kalman_filter import KalmanFilterBank
+from code.detection_store import DetectionStore
+from code.line_annotations import LineAnnotations
+from code.association import associate
+from code.homography import project_points, project_points_inverse, IncrementalHomography
+from code.pitch import Lines, PitchModel
+from code import line_geometry
+from code.scene_change import SceneChangeDetector
+from code.video_reader import VideoReader
+
+# Particles shared by all tracked players, each track adapts its own share between frames
+PARTICLE_BUDGET = 15000
+
+# Furthest a player can move between frames and still be matched to their track, in pitch units
+ASSOCIATION_GATE = 25
+
+# Frames in a row an unmatched detection must be seen before it gets a track of its own
+CONFIRM_FRAMES = 3
+
+# How far off the pitch, in pitch units, a detection may be and still start a track
+PITCH_MARGIN = 10
+
+# Largest distance, in pitch units, between a detected line and the pitch line it is labelled as
+LINE_LABEL_TOLERANCE = 8
 
-    def __init__(self, video, player_detections, line_annotations):
-        self.video = cv2.VideoCapture(video)
+# Structuring elements of the line detector, built once rather than on every frame
+ERODE_KERNEL = np.ones((20, 20), np.uint8)
+MASK_CLOSE_KERNEL = np.ones((50, 50), np.uint8)
+EDGE_CLOSE_KERNEL = np.ones((5, 5), np.uint8)
+CANNY_CLOSE_KERNEL = np.ones((9, 9), np.uint8)
+
+# Downscaled kernels for the pitch mask, keyed by the scale they are built at
+_SCALED_KERNELS = {}
+
+# Per-player filter implementations the tracker can run on, picked per deployment
+FILTER_BACKENDS = {
+    'particle': lambda: ParticleFilterBank(500, resampler='systematic', adaptive=True, budget=PARTICLE_BUDGET),
+    'kalman': lambda: KalmanFilterBank(),
+}
+
+class Tracker:
+    """
+    :param line_annotations: HDF5 file of hand labelled pitch lines, see LineAnnotations. Detected
+    lines can only be labelled against an earlier homography, so either this or initial_H is needed
+    :param initial_H: Homography of the first frame
+    """
+
+    def __init__(self, video, player_detections, line_annotations=None, backend='particle', initial_H=None, pyramid_lines=False, pitch=None, scene_tier='phash', read_ahead=False):
+        if line_annotations is None and initial_H is None:
+            raise ValueError("the first homography needs line_annotations or initial_H to label the lines against")
+
+        self.scene_change = SceneChangeDetector(scene_tier)
+        # With read_ahead the cut decisions are made on the decode thread
+        # Live runs pass video=None and hand their frames to process_frame
+        if video is None:
+            self.video = None
+        else:
+            self.video = VideoReader(video, self.scene_change) if read_ahead else cv2.VideoCapture(video)
         self.detect_file = player_detections
+        # Live runs have no store, their detections are passed to process_frame
+        self.detections = DetectionStore(player_detections) if player_detections is not None else None
         self.line_file = line_annotations
+        self.annotations = LineAnnotations(line_annotations) if line_annotations is not None else None
 
-        self.PHash = cv2.img_hash_PHash().create()
-        self.old_hash = None
         # self.pitch
         self.counter = 0
         self.H = None
+        self.pyramid_lines = pyramid_lines
+        self.pitch = pitch if pitch is not None else PitchModel()
+        self.homography = IncrementalHomography(self.estimate_homography, prior=initial_H)
 
-        self.filters = []
+        self.filters = FILTER_BACKENDS[backend]()
+        # Detections waiting to be confirmed as players, with the frames in a row each was seen
+        self.candidates = np.empty((0, 2), np.float32)
+        self.candidate_hits = np.empty(0, dtype=int)
+
+    def seek(self, frame_no):
+        """
+        Jump to a frame of the video. Nothing carries over from the frame before, as after a scene change.
+        """
+        if isinstance(self.video, VideoReader):
+            raise ValueError("cannot seek a read ahead tracker")
+
+        self.video.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
+        self.counter = frame_no
+        self.H = None
+
+        self.scene_change.reset()
+        self.homography.reset()
+        self.filters.clear()
+        self.clear_candidates()
+
+    def release(self):
+        if self.video is not None:
+            self.video.release()
+        if self.detections is not None:
+            self.detections.close()
+
+    def get_pitch_mask(self, frame, scale=1):
+        """
+        :param scale: Factor the frame is shrunk by before building the mask
+        :return: Mask of the frame, True where the pixel is off the pitch
+        """
+        if scale != 1:
+            frame = cv2.resize(frame, None, fx=1 / scale, fy=1 / scale, interpolation=cv2.INTER_AREA)
+            if scale not in _SCALED_KERNELS:
+                _SCALED_KERNELS[scale] = (np.ones((round(20 / scale),) * 2, np.uint8), np.ones((round(50 / scale),) * 2, np.uint8))
+            erode, close = _SCALED_KERNELS[scale]
+        else:
+            erode, close = ERODE_KERNEL, MASK_CLOSE_KERNEL
 
-    def get_lines(self, frame):
         hue = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)[:, :, 0]
         vals = np.histogram(hue, bins=180)[0] # Most common hue
 
@@ -46,27 +122,59 @@ class Tracker:
         pitch_mask[hue >= np.argmax(vals) + 5] = 0
 
         # Mask conversion
-        pitch_mask = cv2.morphologyEx(pitch_mask, cv2.MORPH_ERODE, np.ones((20, 20)))
-        pitch_mask = cv2.morphologyEx(pitch_mask, cv2.MORPH_CLOSE, np.ones((50, 50))) <= 25
+        pitch_mask = cv2.morphologyEx(pitch_mask, cv2.MORPH_ERODE, erode)
+        pitch_mask = cv2.morphologyEx(pitch_mask, cv2.MORPH_CLOSE, close)
+        return pitch_mask <= 25
 
+    def get_edges(self, frame, pitch_mask):
         l = cv2.cvtColor(frame, cv2.COLOR_BGR2Lab)[:, :, 0]
         bg = cv2.medianBlur(l, 15)
 
         edges = l - bg
         edges[edges < 10] = 255
         edges[pitch_mask] = 255
-        edges = (edges < 128).astype(float)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((5, 5)))
+        edges = (edges < 128).astype(np.uint8)
+        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, EDGE_CLOSE_KERNEL)
 
-        edges = cv2.Canny(edges.astype(np.uint8), 50, 100, apertureSize=7)
-        edges = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((9, 9)))
-        lines = cv2.HoughLines(edges, 3, np.pi / 180, 800)
+        edges = cv2.Canny(edges, 50, 100, apertureSize=7)
+        return cv2.morphologyEx(edges, cv2.MORPH_CLOSE, CANNY_CLOSE_KERNEL)
 
-        final = np.zeros((720, 1280))
+    def get_lines(self, frame, pyramid=None):
+        """
+        :param pyramid: Build the pitch mask at quarter resolution and only look for edges inside
+        the bounding box of the pitch, defaults to the tracker setting
+        :return: Image of the detected lines and the (L, 1, 4) line segments in frame coordinates
+        """
+        if pyramid is None:
+            pyramid = self.pyramid_lines
+
+        if pyramid:
+            small_mask = self.get_pitch_mask(frame, 4)
+            pitch_mask = cv2.resize(small_mask.view(np.uint8), frame.shape[1::-1], interpolation=cv2.INTER_NEAREST).view(bool)
+
+            # Region of interest around the pitch, padded for the median blur and closing
+            rows = np.flatnonzero(~small_mask.all(axis=1))
+            cols = np.flatnonzero(~small_mask.all(axis=0))
+            if len(rows) == 0:
+                return np.zeros(frame.shape[:2], np.uint8), None
+
+            y0, y1 = max(rows[0] * 4 - 16, 0), min(rows[-1] * 4 + 20, frame.shape[0])
+            x0, x1 = max(cols[0] * 4 - 16, 0), min(cols[-1] * 4 + 20, frame.shape[1])
+            edges = self.get_edges(frame[y0:y1, x0:x1], pitch_mask[y0:y1, x0:x1])
+        else:
+            pitch_mask = self.get_pitch_mask(frame)
+            x0 = y0 = 0
+            edges = self.get_edges(frame, pitch_mask)
+
+        lines = cv2.HoughLinesP(edges, 3, np.pi / 180, 800, minLineLength=100, maxLineGap=10)
+
+        final = np.zeros(frame.shape[:2], np.uint8)
         if lines is not None:
+            # OpenCV 5 drops the middle axis of the segments
+            lines = lines.reshape(-1, 1, 4) + np.array([x0, y0, x0, y0], dtype=lines.dtype)
             for [[x1, y1, x2, y2]] in lines:
                 if ((x1 - x2) ** 2 + (y1 - y2) ** 2) ** 0.5 > 100:
-                    cv2.line(final, (x1, y1), (x2, y2), 255, 5)
+                    cv2.line(final, (int(x1), int(y1)), (int(x2), int(y2)), 255, 5)
 
         final[pitch_mask] = 0
         return final, lines
@@ -75,76 +183,30 @@ class Tracker:
         if lines is None:
             return
 
-        out = []
-
-        for [[x1, y1, x2, y2]] in lines:
-            if ((x1- x2) ** 2 + (y1 + y2) ** 2) ** 0.5 < 10:
-                continue
-
-            a = y1 - y2
-            b = x2 - x1
-            c = x1 * y2 - x2 * y1
-
-            use = True
-
-            for ap, bp, cp, _, _, _, _ in out:
-                if (np.isclose(a, ap) or np.isclose(a / ap, 1, 1)) and (np.isclose(b, bp) or np.isclose(b / bp, 1, 1)) and (np.isclose(c, cp) or np.isclose(c / cp, 1, 1)):
-                    use = False
-                    break
-
-            if use:
-                out.append((a, b, c, x1, y1, x2, y2))
+        out = line_geometry.deduplicate(line_geometry.segments_to_equations(lines))
 
         if len(out) > 0:
-            return np.vstack(out)
+            return out
 
     def find_intersections(self, lines, is_footage):
-        intersections = []
-
-        for i in range(len(lines)):
-            if i == j:
-                continue
-
-            if is_footage:
-                t1, a1, b1, c1, _, _, _, _ = lines[i]
-                t2, a2, b2, c2, _, _, _, _ = lines[j]
-            else:
-                try:
-                    t1, a1, b1, c1 = lines[i]
-                    t2, a2, b2, c2 = lines[j]
-                except TypeError:
-                    return
-
-            if t1 == t2 or t1 == -1 or t2 == -1:
-                continue
-
-            try:
-                x = (b1 * c2 - b2 * c1) / (a1 * b2 - a2 * b1), (a2 * c1 - a1 * c2) / (a1 * b2 - a2 * b1)
-            except ZeroDivisionError:
-                continue
-
-            x = np.concatenate((np.array([min(t1, t2), max(t1, t2)]), x))
-            intersections.append((x))
-
-        if intersections:
-            return np.vstack(intersections)
+        # Footage lines carry their end points after t, a, b, c, pitch lines stop there
+        if lines is None or any(line is None for line in lines):
+            return
+
+        intersections = line_geometry.intersections(lines)
+
+        if len(intersections):
+            return intersections
         return
 
     def draw_lines(self, frame, equations, greyscale=True):
         if equations is None:
             return frame
 
-        for a, b, c, _, _, _, _ in equations:
-            try:
-                p1 = 0, int(-c / b)
-                p2 = 1280, int(-((c + 1280 * a) / b))
-
-                if greyscale:
-                    cv2.line(frame, p1, p2, 128, 2)
-                else:
-                    cv2.line(frame, p1, p2, (0, 255, 0), 4)
-            except:
-                continue
+        # Drawn between the segment ends, vertical lines have no y = mx + c form to extend
+        colour, thickness = (128, 2) if greyscale else ((0, 255, 0), 4)
+        for x1, y1, x2, y2 in equations[:, 3:7].astype(int):
+            cv2.line(frame, (int(x1), int(y1)), (int(x2), int(y2)), colour, thickness)
 
         return frame
 
@@ -155,136 +217,266 @@ class Tracker:
         :param line: A label specifying the line required.
         :return: The equation of the requested line, None if an invalid line
         """
-        # Left for reference
-        values = {
-            0: 'left_try',
-            1: 'left_five',
-            2: 'left_twenty_two',
-            3: 'left_ten',
-            4: 'halfway',
-            5: 'right_ten',
-            6: 'right_twenty_two',
-            7: 'right_five',
-            8: 'right_try',
-            9: 'top_touch',
-            10: 'top_5',
-            11: 'top_15',
-            12: 'bottom_15',
-            13: 'bottom_5',
-            14: 'bottom_touch',
-        }
-
-        if line == 0:
-            return (0, 1, 0, -83)
-        elif line == 1:
-            return (1, 1, 0, -104)
-        elif line == 2:
-            return (2, 1, 0, -178)
-        elif line == 3:
-            return (3, 1, 0, -257)
-        elif line == 4:
-            return (4, 1, 0, -300)
-        elif line == 5:
-            return (5, 1, 0, -343)
-        elif line == 6:
-            return (6, 1, 0, -421)
-        elif line == 7:
-            return (7, 1, 0, -495)
-        elif line == 8:
-            return (8, 1, 0, -517)
-        elif line == 9:
-            return (9, 0, 1, -14)
-        elif line == 10:
-            return (10, 0, 1, -34)
-        elif line == 11:
-            return (11, 0, 1, -78)
-        elif line == 12:
-            return (12, 0, 1, -252)
-        elif line == 13:
-            return (13, 0, 1, -295)
-        elif line == 14:
-            return (14, 0, 1, -317)
+        return self.pitch.equation(line)
 
     def get_point_pairs(self, footage_points):
-        out = []
-
-        if footage_points is not None:
-            for t1, t2, x, y in footage_points:
-                res = self.find_intersections([self.get_pitch_equation(t1), self.get_pitch_equation(t2)], False)
-                if res is None:
-                    continue
-
-                out.append((x, y, res[0, 2], res[0, 3]))
+        if footage_points is None:
+            return False, None
 
+        out = self.pitch.point_pairs(footage_points)
         if len(out) >= 4:
-            return True, np.vstack(out)
+            return True, out
         return False, None
 
-    def get_detection_positions(self, detections):
-        out = np.zeros((len(detections), 2))
+    def label_lines(self, equations, H):
+        """
+        Label each detected line with the pitch line it lies on, by projecting it onto the pitch
+        through a previous homography.
+        :param equations: Output of get_equations
+        :return: The equations with a leading label column, -1 for lines matching no pitch line
+        """
+        start = project_points(equations[:, 3:5], H)
+        end = project_points(equations[:, 5:7], H)
+        vertical = np.abs(end[:, 0] - start[:, 0]) < np.abs(end[:, 1] - start[:, 1])
+        middle = (start + end) / 2
+
+        # Pitch lines are either x = -c or y = -c
+        pitch = self.pitch.equations
+        pitch_vertical = pitch[:, 1] == 1
+
+        offset = np.where(vertical, middle[:, 0], middle[:, 1])[:, np.newaxis] + pitch[:, 3]
+        dists = np.where(vertical[:, np.newaxis] == pitch_vertical, np.abs(offset), np.inf)
+
+        labels = np.argmin(dists, axis=1)
+        labels[dists[np.arange(len(dists)), labels] > LINE_LABEL_TOLERANCE] = -1
+        return np.column_stack((labels, equations))
+
+    def estimate_homography(self, frame, prior):
+        """
+        Full estimate of H from the pitch markings of the frame.
+        :param prior: Previous homography, used to label the detected lines
+        :return: The new homography, None if too few labelled intersections were found
+        """
+        if prior is None:
+            return
+
+        _, lines = self.get_lines(frame)
+        equations = self.get_equations(lines)
+        if equations is None:
+            return
 
-        for i, (x1, y1, x2, y2) in enumerate(detections):
-            out[i] = (x1 + x2) / 2, (y1 + y2) / 2
+        footage_points = self.find_intersections(self.label_lines(equations, prior), True)
+        ok, pairs = self.get_point_pairs(footage_points)
+        if not ok:
+            return
+
+        H, _ = cv2.findHomography(pairs[:, :2], pairs[:, 2:], cv2.RANSAC, 5.)
+        return H
 
-        return out.astype(np.float32)
+    def annotated_homography(self, frame_no):
+        """
+        Homography from the hand labelled lines of a frame, no prior needed.
+        :return: The homography, None if the frame is not annotated or has too few intersections
+        """
+        if self.annotations is None or frame_no not in self.annotations:
+            return
+
+        segments, labels = self.annotations[frame_no]
+        equations = np.column_stack((labels, line_geometry.segments_to_equations(segments, min_length=0)))
+        ok, pairs = self.get_point_pairs(self.find_intersections(equations, True))
+        if not ok:
+            return
+
+        # The labels are exact, every pair is an inlier
+        H, _ = cv2.findHomography(pairs[:, :2], pairs[:, 2:])
+        return H
+
+    def get_detection_positions(self, detections):
+        # Either the YOLO structured detection array or a plain (N, 4) array of x1, y1, x2, y2
+        if getattr(detections, 'dtype', None) is not None and detections.dtype.names:
+            out = np.empty((len(detections), 2), np.float32)
+            out[:, 0] = (detections['xmin'] + detections['xmax']) / 2
+            out[:, 1] = (detections['ymin'] + detections['ymax']) / 2
+            return out
+
+        detections = np.asarray(detections, np.float32).reshape(-1, 4)
+        return (detections[:, :2] + detections[:, 2:]) / 2
 
     def translate_points(self, footage_points):
-        points = np.zeros((len(footage_points), 2), np.float32)
+        return project_points(footage_points, self.H)
+
+    def to_footage(self, pitch_points):
+        return project_points_inverse(pitch_points, self.H)
+
+    def clear_candidates(self):
+        self.candidates = np.empty((0, 2), np.float32)
+        self.candidate_hits = np.empty(0, dtype=int)
+
+    def confirm_candidates(self, points):
+        """
+        Track detections that no track claimed only once they have been seen on the pitch for
+        CONFIRM_FRAMES frames in a row, so spectators, flickers and false positives do not each
+        start a track of their own.
+        :param points: (N, 2) pitch positions of the unmatched detections
+        :return: Positions of the candidates confirmed on this frame
+        """
+        width, height = self.pitch.size
+        on_pitch = np.all((points >= -PITCH_MARGIN) & (points <= (width + PITCH_MARGIN, height + PITCH_MARGIN)), axis=1)
+        points = points[on_pitch]
+
+        row, col, _, new_points = associate(self.candidates, points, ASSOCIATION_GATE)
 
-        for i, r in enumerate(np.insert(footage_points, 2, 1, 1)):
-            p_prime = self.H @ r
-            p_prime = p_prime[0] / p_prime[2], p_prime[1] / p_prime[2]
-            points[i] = p_prime
+        # Candidates missed on this frame are dropped, new detections start at one hit
+        hits = np.concatenate((self.candidate_hits[row] + 1, np.ones(len(new_points), dtype=int)))
+        candidates = np.concatenate((points[col], points[new_points])).astype(np.float32)
 
-        return points
+        confirmed = hits >= CONFIRM_FRAMES
+        self.candidates, self.candidate_hits = candidates[~confirmed], hits[~confirmed]
+        return candidates[confirmed]
 
     def update_filters(self, scene_changed, points):
         if scene_changed:
-            self.filters = []
+            self.filters.clear()
+            self.clear_candidates()
 
-        if not self.filters:
-            for point in points:
-                self.filters.append(ParticleFilter(500, point))
-
-            return points
+        if not len(self.filters):
+            new_points = np.arange(len(points))
         else:
-            dists = np.empty((len(self.filters), len(points)))
-            for i, filter in enumerate(self.filters):
-                filter.predict()
-                dists[i] = np.linalg.norm(points - filter.estimate(), axis=1)
-
-            new_filters = []
-            try:
-                row, col = linear_sum_assignment(dists)
-            except ValueError:
-                return self.filters
-
-            for i in range(len(col)):
-                if dists[row[i], col[i]] > 25:
-                    pass
-                    new_filters.append(ParticleFilter(500, points[col[i]]))
-                else:
-                    filter = self.filters[row[i]]
-                    new_filters.append(filter)
-                    filter.update(points[col[i]])
-                    filter.resample()
-
-            for filter in self.filters:
-                if filter not in new_filters and not filter.update_none():
-                    new_filters.append(filter)
-
-            self.filters = new_filters
+            self.filters.predict()
+            row, col, unmatched, new_points = associate(self.filters.estimate(), points, ASSOCIATION_GATE)
+
+            self.filters.update(row, points[col])
+            self.filters.resample(row)
+
+            self.filters.remove(unmatched[self.filters.update_none(unmatched)])
+
+        confirmed = self.confirm_candidates(points[new_points])
+        if len(confirmed):
+            self.filters.add(confirmed)
 
     def get_frame(self, add_lines, add_players, add_translated_points, add_particle_filters):
-        ok, frame = self.video.read()
+        if isinstance(self.video, VideoReader):
+            ok, frame, changed_scene = self.video.read()
+        else:
+            ok, frame = self.video.read()
+            changed_scene = ok and self.scene_change.update(frame)
 
-        new_hash = self.PHash.compute(frame)
-        changed_scene = False
+        if not ok:
+            return None, False
 
-        if self.old_hash is not None:
-            if self.PHash.compare(self.old_hash, new_hash) > 10:
-                changed_scene = True
+        # Detections come from the store written by the YOLO stage, the detector is never re-run here
+        detections = self.detections[self.counter]
+        keyframe = self.detections.is_keyframe(self.counter)
+        H = self.annotated_homography(self.counter)
+        self.counter += 1
 
-        self.old_hash = new_hash
+        frame = self.process_frame(frame, changed_scene, detections, keyframe, add_players, add_particle_filters, H=H,
+                                   add_lines=add_lines, add_translated_points=add_translated_points)
 
         #tmp = self.pitch.copy()
+
+        return frame, changed_scene
+
+    def process_frame(self, frame, changed_scene, detections, keyframe=True, add_players=False, add_particle_filters=False, refine_homography=True, H=None,
+                      add_lines=False, add_translated_points=False):
+        """
+        Run one frame, however it was read, through the homography and the filters.
+        :param detections: (N, 4) player boxes of the frame
+        :param keyframe: False if the detector did not run on this frame
+        :param refine_homography: Keep the previous homography rather than update it, unless the scene changed
+        :param H: Known homography of the frame, from its annotated lines, used instead of estimating one
+        :param add_lines: Draw the pitch lines detected in the frame
+        :param add_translated_points: Draw the pitch line intersections mapped onto the frame through
+        the homography, showing how well it fits
+        :return: The frame with the requested overlays
+        """
+        self.update_homography(frame, changed_scene, refine_homography, H)
+        self.track_players(changed_scene, detections, keyframe)
+
+        if add_lines:
+            # Found again on the frame before anything is drawn on it
+            _, lines = self.get_lines(frame)
+            self.draw_lines(frame, self.get_equations(lines), greyscale=False)
+
+        if self.H is not None and add_translated_points:
+            i, j = np.triu_indices(len(self.pitch.equations), 1)
+            points = self.pitch.intersections[i, j]
+            for x, y in self.to_footage(points[~np.isnan(points[:, 0])]).astype(int):
+                cv2.circle(frame, (int(x), int(y)), 6, (0, 255, 255), 2)
+
+        if add_players:
+            for x1, y1, x2, y2 in np.asarray(detections).reshape(-1, 4).astype(int):
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+
+        if self.H is not None and add_particle_filters and len(self.filters):
+            # Overlay the tracked positions back onto the footage
+            for x, y in self.to_footage(self.filters.estimate()).astype(int):
+                cv2.circle(frame, (int(x), int(y)), 5, (255, 0, 0), -1)
+
+        return frame
+
+    def update_homography(self, frame, changed_scene, refine_homography=True, H=None):
+        """
+        :return: The homography of the frame, None if it is unknown
+        """
+        if H is not None:
+            self.H = self.homography.anchor(frame, H)
+        elif refine_homography or changed_scene or self.H is None:
+            self.H = self.homography.update(frame, changed_scene)
+        return self.H
+
+    def track_players(self, changed_scene, detections, keyframe=True):
+        """
+        Step the filters with the detections of a frame whose homography is already in self.H.
+        """
+        players = self.get_detection_positions(detections)
+
+        if self.H is None:
+            # Nothing can be placed on the pitch, but the tracks of the scene before are still gone
+            if changed_scene:
+                self.filters.clear()
+                self.clear_candidates()
+        elif keyframe or len(players) or changed_scene:
+            self.update_filters(changed_scene, self.translate_points(players))
+        else:
+            # Between keyframes with nothing carried forward the filters coast on their motion model
+            self.filters.predict()
+
+def benchmark_get_lines(tracker, n_frames=100, tolerance=10):
+    """
+    Compare the full resolution line detector against the pyramid mode on the same frames.
+    Recall is the share of full resolution segments with a pyramid segment whose ends lie within
+    tolerance pixels of their own.
+    """
+    times = {False: 0., True: 0.}
+    found, matched = 0, 0
+
+    for _ in range(n_frames):
+        ok, frame = tracker.video.read()[:2]
+        if not ok:
+            break
+
+        lines = {}
+        for pyramid in (False, True):
+            start = time.perf_counter()
+            lines[pyramid] = tracker.get_lines(frame, pyramid)[1]
+            times[pyramid] += time.perf_counter() - start
+
+        if lines[False] is None:
+            continue
+
+        full = lines[False].reshape(-1, 4).astype(float)
+        found += len(full)
+        if lines[True] is None:
+            continue
+
+        pyramid = lines[True].reshape(-1, 4).astype(float)
+        ends = [np.linalg.norm((full[:, np.newaxis] - p).reshape(len(full), -1, 2, 2), axis=-1).max(axis=-1)
+                for p in (pyramid, pyramid[:, [2, 3, 0, 1]])]
+        matched += np.count_nonzero((np.minimum(*ends) < tolerance).any(axis=1))
+
+    recall = matched / found if found else 1.
+    print("Full resolution: %.2f ms/frame" % (1000 * times[False] / n_frames))
+    print("Pyramid:         %.2f ms/frame" % (1000 * times[True] / n_frames))
+    print("Line recall:     %.1f%% of %d segments" % (100 * recall, found))
+    return times[False] / n_frames, times[True] / n_frames, recall
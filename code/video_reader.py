@@ -0,0 +1,57 @@
+import queue
+import threading
+
+import cv2
+
+
+class VideoReader:
+    """
+    Decodes the video on its own thread, a bounded number of frames ahead of the tracker. Each
+    frame is run through the scene change detector on the same thread, so the cut decision is
+    ready by the time the frame is read.
+    :param detector: SceneChangeDetector to run ahead, or None
+    """
+
+    def __init__(self, video, detector=None, maxsize=32):
+        self.video = cv2.VideoCapture(video)
+        self.detector = detector
+        self.frames = queue.Queue(maxsize=maxsize)
+        self.stopped = threading.Event()
+
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stopped.is_set():
+            ok, frame = self.video.read()
+            if not ok:
+                break
+
+            cut = self.detector.update(frame) if self.detector is not None else False
+            self.frames.put((frame, cut))
+
+        self.frames.put((None, False))
+
+    def read(self):
+        """
+        :return: Whether a frame was read, the frame and whether it starts a new scene
+        """
+        frame, cut = self.frames.get()
+        if frame is None:
+            # Leave the end marker for any later reads
+            self.frames.put((None, False))
+            return False, None, False
+        return True, frame, cut
+
+    def release(self):
+        self.stopped.set()
+
+        # Unblock the reader if it is waiting on a full queue
+        while self.thread.is_alive():
+            try:
+                self.frames.get_nowait()
+            except queue.Empty:
+                pass
+            self.thread.join(0.01)
+
+        self.video.release()